@@ -1,16 +1,28 @@
 from state_types import DeckAnalysisState
 from agents.topic_extract import get_relevant_pages
-from utils.llm import query_pdf_page
-from langchain_anthropic import ChatAnthropic
+from utils.llm import query_pdf_page_structured
+from utils.pdf_session import PdfSession, require_session
+from utils.llm_gateway import get_chat_model
+from utils.prompt_compaction import deck_context
 from langchain_core.messages import SystemMessage, HumanMessage
 from utils.search_client import search_tavily
+from utils.structured_output import ClaimVerifications, CompetitorClaimsExtraction, invoke_structured
+from utils.executor import map_concurrently
+from utils.config import VERIFICATION_MAX_CONCURRENCY
 import json
 from dotenv import load_dotenv
 
 load_dotenv()
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", temperature=0)
+llm = get_chat_model("analyse_competition_agent")
 
-def analyse_competition_agent(state: DeckAnalysisState) -> DeckAnalysisState:
+# Grading instructions shared by the competitor and market claim verifications
+CLAIM_VERIFICATION_SYSTEM_PROMPT = """
+    You verify claims made in a startup's pitch deck using the web search results provided.
+
+    Verify each claim in the order provided, quoting its exact text. Be strict with accuracy.
+    """
+
+def analyse_competition_agent(state: DeckAnalysisState) -> dict:
     """
     Analyzes competitor claims in the pitch deck by verifying specific statements
     made about competitors rather than doing general market research.
@@ -24,12 +36,12 @@ def analyse_competition_agent(state: DeckAnalysisState) -> DeckAnalysisState:
         # Use the first competitor page found
         competitor_page = competitor_pages[0]
         page_index = competitor_page.get("page_number", 1) - 1
-        pdf_path = "test_pitch_solea.pdf"
+        document = require_session(state["document_id"])
         
         print(f"Analyzing competitor claims on page {page_index}")
         
         # Step 1: Extract specific claims about competitors
-        competitor_claims = extract_competitor_claims(page_index, pdf_path)
+        competitor_claims = extract_competitor_claims(page_index, document)
         
         # Step 2: Verify each claim individually
         verified_claims = verify_all_claims(competitor_claims)
@@ -37,75 +49,49 @@ def analyse_competition_agent(state: DeckAnalysisState) -> DeckAnalysisState:
         # Step 3: Generate final feedback based on claim accuracy
         final_feedback = generate_claim_verification_feedback(verified_claims, state["general_context"])
         
-        # Store results
-        state["page_feedback"] = {
-            "competitor_claims": competitor_claims,
-            "verified_claims": verified_claims,
-            "accuracy_summary": calculate_overall_accuracy(verified_claims),
-            "written_feedback": final_feedback,
-            "verification_mode": "claim_fact_checking"
+        return {
+            "page_feedback": {
+                "competitors_slide": {
+                    "page_number": competitor_page.get("page_number", 1),
+                    "competitor_claims": competitor_claims,
+                    "verified_claims": verified_claims,
+                    "accuracy_summary": calculate_overall_accuracy(verified_claims),
+                    "written_feedback": final_feedback,
+                    "verification_mode": "claim_fact_checking"
+                }
+            }
         }
     
-    return state
+    return {}
 
 
-def extract_competitor_claims(page_number: int, pdf_path: str) -> dict:
+def extract_competitor_claims(page_number: int, document: PdfSession) -> dict:
     """Extract specific, verifiable claims about competitors from the PDF page"""
     
     extraction_prompt = """
     Extract ALL specific claims about competitors from this slide. Focus on FACTUAL STATEMENTS that can be verified, not opinions.
 
-    Return ONLY valid JSON in this exact format:
-    {
-      "competitor_claims": [
-        {
-          "competitor_name": "Exact company name mentioned",
-          "factual_claims": [
-            "They have X number of users",
-            "They raised $X million in funding", 
-            "They were founded in YEAR",
-            "They operate in X countries"
-          ],
-          "feature_claims": [
-            "They only support X feature",
-            "They don't have Y capability",
-            "Their platform is limited to Z"
-          ],
-          "performance_claims": [
-            "They are slower than us",
-            "They have higher prices",
-            "They have poor customer satisfaction"
-          ],
-          "positioning_claims": [
-            "We are better because...",
-            "Unlike them, we...",
-            "They target X market, we target Y"
-          ]
-        }
-      ],
-      "market_position_claims": [
-        "We are the first to...",
-        "No one else does...",
-        "The market size is $X billion"
-      ]
-    }
-
-    Extract EXACT wording used in the slide. If no competitors mentioned, return empty arrays.
+    Extract EXACT wording used in the slide. If no competitors mentioned, return empty lists.
     """
     
-    raw_response = query_pdf_page(page_number, extraction_prompt, pdf_path)
-    return parse_json_safely(raw_response)
+    claims = query_pdf_page_structured(page_number, extraction_prompt, document, CompetitorClaimsExtraction,
+                                       agent_name="analyse_competition_agent")
+    if claims is None:
+        return {"competitor_claims": [], "market_position_claims": []}
+    return claims.model_dump()
 
 
 def verify_all_claims(competitor_claims: dict) -> list:
-    """Verify claims made about competitors using minimal searches"""
-    
-    all_verified_claims = []
+    """Verify claims made about competitors using minimal searches.
+
+    Every competitor batch and the market claims batch run concurrently, VERIFICATION_MAX_CONCURRENCY
+    at a time. A batch that fails leaves its claims as insufficient_evidence and the others are kept.
+    """
     
-    # Verify competitor-specific claims (1-2 searches per competitor)
+    # One batch per competitor (1-2 searches each), plus one for all market position claims (1 search)
+    batches = []
     for competitor in competitor_claims.get("competitor_claims", []):
         competitor_name = competitor.get("competitor_name", "")
-        print(f"Verifying claims about: {competitor_name}")
         
         # Collect all claims for this competitor
         all_claims = []
@@ -115,30 +101,34 @@ def verify_all_claims(competitor_claims: dict) -> list:
         all_claims.extend(competitor.get("positioning_claims", []))
         
         if all_claims:
-            # Do 1-2 searches per competitor to verify ALL their claims
-            verification_results = verify_competitor_batch(competitor_name, all_claims)
-            
-            # Add individual claim results
-            for i, claim in enumerate(all_claims):
-                all_verified_claims.append({
-                    "competitor": competitor_name,
-                    "claim": claim,
-                    "claim_type": categorize_claim_type(claim, competitor),
-                    "verification": verification_results[i] if i < len(verification_results) else {"verdict": "insufficient_evidence"}
-                })
-    
-    # Verify market position claims (1 search for all market claims)
+            batches.append((competitor_name, all_claims, competitor))
+    
     market_claims = competitor_claims.get("market_position_claims", [])
     if market_claims:
-        print(f"Verifying {len(market_claims)} market claims...")
-        market_verification_results = verify_market_claims_batch(market_claims)
-        
-        for i, market_claim in enumerate(market_claims):
+        batches.append(("MARKET_CLAIM", market_claims, None))
+    
+    def verify(batch):
+        name, claims, competitor = batch
+        if competitor is None:
+            print(f"Verifying {len(claims)} market claims...")
+            return verify_market_claims_batch(claims)
+        print(f"Verifying claims about: {name}")
+        return verify_competitor_batch(name, claims)
+    
+    results = map_concurrently(verify, batches, VERIFICATION_MAX_CONCURRENCY, return_exceptions=True)
+    
+    # Add individual claim results, in the order of the slide
+    all_verified_claims = []
+    for (name, claims, competitor), verification_results in zip(batches, results):
+        if isinstance(verification_results, Exception):
+            print(f"Claim verification failed for {name}: {verification_results!r}")
+            verification_results = []
+        for i, claim in enumerate(claims):
             all_verified_claims.append({
-                "competitor": "MARKET_CLAIM",
-                "claim": market_claim,
-                "claim_type": "market_positioning",
-                "verification": market_verification_results[i] if i < len(market_verification_results) else {"verdict": "insufficient_evidence"}
+                "competitor": name,
+                "claim": claim,
+                "claim_type": categorize_claim_type(claim, competitor) if competitor is not None else "market_positioning",
+                "verification": verification_results[i] if i < len(verification_results) else {"verdict": "insufficient_evidence"}
             })
     
     return all_verified_claims
@@ -147,16 +137,18 @@ def verify_all_claims(competitor_claims: dict) -> list:
 def verify_competitor_batch(competitor_name: str, all_claims: list) -> list:
     """Verify all claims about a competitor using 1-2 searches total"""
     
-    # General company info search
-    general_query = f'"{competitor_name}" company business model features users funding'
-    general_results = search_tavily(general_query, max_results=3)
-    
-    # Performance/comparison search if there are performance claims
+    # General company info search, plus a performance/comparison search if there are performance claims
+    searches = [(f'"{competitor_name}" company business model features users funding', 3)]
     performance_claims = [c for c in all_claims if any(word in c.lower() for word in ["faster", "slower", "better", "price", "cost"])]
-    performance_results = []
     if performance_claims:
-        perf_query = f'"{competitor_name}" pricing performance reviews comparison'
-        performance_results = search_tavily(perf_query, max_results=2)
+        searches.append((f'"{competitor_name}" pricing performance reviews comparison', 2))
+    
+    # Both searches are sent in parallel
+    search_results = map_concurrently(
+        lambda search: search_tavily(search[0], max_results=search[1]), searches, len(searches)
+    )
+    general_results = search_results[0]
+    performance_results = search_results[1] if performance_claims else []
     
     # Let LLM verify all claims at once using the search results
     verification_prompt = f"""
@@ -170,29 +162,13 @@ def verify_competitor_batch(competitor_name: str, all_claims: list) -> list:
     
     PERFORMANCE/COMPARISON INFO:
     {json.dumps(performance_results, indent=2)}
-    
-    For each claim, return verification in this JSON format:
-    {{
-      "claim_verifications": [
-        {{
-          "claim": "exact claim text",
-          "verdict": "accurate|inaccurate|partially_accurate|insufficient_evidence",
-          "confidence": "high|medium|low",
-          "supporting_evidence": "Specific evidence",
-          "contradicting_evidence": "Contradicting evidence if any",
-          "accuracy_score": 75,
-          "evidence_quality": "strong|moderate|weak|none"
-        }}
-      ]
-    }}
-    
-    Verify each claim in the order provided. Be strict with accuracy.
     """
     
-    response = llm.invoke([HumanMessage(content=verification_prompt)])
-    result = parse_json_safely(response.content)
-    
-    return result.get("claim_verifications", [{"verdict": "insufficient_evidence"}] * len(all_claims))
+    result = invoke_structured(llm, [SystemMessage(content=CLAIM_VERIFICATION_SYSTEM_PROMPT),
+                                     HumanMessage(content=verification_prompt)], ClaimVerifications)
+    if result is None:
+        return [{"verdict": "insufficient_evidence"}] * len(all_claims)
+    return [verification.model_dump() for verification in result.claim_verifications]
 
 
 def verify_market_claims_batch(market_claims: list) -> list:
@@ -211,29 +187,13 @@ def verify_market_claims_batch(market_claims: list) -> list:
     
     SEARCH RESULTS:
     {json.dumps(search_results, indent=2)}
-    
-    For each claim, return verification in this JSON format:
-    {{
-      "claim_verifications": [
-        {{
-          "claim": "exact claim text",
-          "verdict": "accurate|inaccurate|partially_accurate|insufficient_evidence",
-          "confidence": "high|medium|low",
-          "supporting_evidence": "Data/sources that support the claim",
-          "contradicting_evidence": "Data that contradicts the claim",
-          "accuracy_score": 75,
-          "evidence_quality": "strong|moderate|weak|none"
-        }}
-      ]
-    }}
-    
-    Verify each claim in the order provided.
     """
     
-    response = llm.invoke([HumanMessage(content=verification_prompt)])
-    result = parse_json_safely(response.content)
-    
-    return result.get("claim_verifications", [{"verdict": "insufficient_evidence"}] * len(market_claims))
+    result = invoke_structured(llm, [SystemMessage(content=CLAIM_VERIFICATION_SYSTEM_PROMPT),
+                                     HumanMessage(content=verification_prompt)], ClaimVerifications)
+    if result is None:
+        return [{"verdict": "insufficient_evidence"}] * len(market_claims)
+    return [verification.model_dump() for verification in result.claim_verifications]
 
 
 def categorize_claim_type(claim: str, competitor: dict) -> str:
@@ -326,9 +286,6 @@ def generate_claim_verification_feedback(verified_claims: list, general_context:
     ACCURACY SUMMARY:
     {json.dumps(accuracy_summary, indent=2)}
     
-    STARTUP CONTEXT:
-    {general_context}
-    
     Write feedback focusing on:
     1. Which specific claims are ACCURATE vs INACCURATE (be specific)
     2. Any misleading or unfair characterizations of competitors
@@ -340,50 +297,6 @@ def generate_claim_verification_feedback(verified_claims: list, general_context:
     Keep it under 200 words but be impactful.
     """
     
-    response = llm.invoke([HumanMessage(content=feedback_prompt)])
+    messages = [SystemMessage(content=deck_context(general_context)), HumanMessage(content=feedback_prompt)]
+    response = llm.invoke_streaming(messages, slide="competitors_slide")
     return response.content
-
-
-def parse_json_safely(text: str) -> dict:
-    """Safely parse JSON from LLM response with error handling"""
-    
-    try:
-        # Clean up the text
-        text = text.strip()
-        
-        # Remove markdown code blocks if present
-        if text.startswith("```json"):
-            text = text[7:]
-        elif text.startswith("```"):
-            text = text[3:]
-        
-        if text.endswith("```"):
-            text = text[:-3]
-        
-        text = text.strip()
-        
-        # Parse JSON
-        return json.loads(text)
-        
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing failed: {e}")
-        print(f"Raw text: {text[:200]}...")
-        
-        # Try to extract JSON object from text
-        try:
-            start_idx = text.find('{')
-            end_idx = text.rfind('}') + 1
-            
-            if start_idx != -1 and end_idx > start_idx:
-                json_text = text[start_idx:end_idx]
-                return json.loads(json_text)
-        except:
-            pass
-        
-        # Return error structure
-        return {
-            "error": "Failed to parse JSON response",
-            "raw_text": text[:500],
-            "competitor_claims": [],
-            "market_position_claims": []
-        }
\ No newline at end of file
@@ -1,77 +1,54 @@
 from state_types import DeckAnalysisState
 from dotenv import load_dotenv
 import os
-from langchain_anthropic import ChatAnthropic
+from utils.llm_gateway import get_chat_model
+from utils.prompt_compaction import compact_blocks, compact_json, compaction_stats, count_tokens, fit_blocks
+from utils.config import PROMPT_BUDGET_FINAL_SUMMARY_TOKENS
+from utils.structured_output import MatchedFeedback, invoke_structured
 from langchain_core.messages import SystemMessage, HumanMessage
 import json
 
 load_dotenv()
 
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", temperature=0)
+llm = get_chat_model("final_summary_agent")
 
 # create a final summary agent that will take the state and give a final summary of what was false or misleading
 
-def final_summary_agent(state: DeckAnalysisState) -> DeckAnalysisState:
+def final_summary_agent(state: DeckAnalysisState) -> dict:
     print("[Starting Final Summary Agent]")
 
-    # get the page feedback
+    # get the page feedback, merged from every specialist branch and keyed by slide topic
     page_feedback = state.get("page_feedback", {})
 
     # get the tam sam info
     tam_sam_info = state.get("tam_sam_info", "")
 
-    # get the tam sam sources
-    tam_sam_sources = state.get("tam_sam_sources", [])
-
     # get the page content
     page_content = state.get("page_content", [])
 
-    # get the topics
-    topics = state.get("topics", [])
-
-    # Check if we have both team and market size slides
-    has_team_slide = any(t.get("topic") == "team_slide" for t in topics)
-    has_market_slide = any(t.get("topic") == "market_size_slide" for t in topics)
-
-    if has_team_slide or has_market_slide:
-        # Get the relevant page numbers
-        team_page = next((t for t in topics if t.get("topic") == "team_slide"), None)
-        market_page = next((t for t in topics if t.get("topic") == "market_size_slide"), None)
-
-        # Get the page content for the relevant pages
-        relevant_pages = []
-        if team_page:
-            relevant_pages.append({
-                "page_number": team_page["page_number"],
-                "content": next((p for p in page_content if p["page_number"] == team_page["page_number"] - 1), {}),
-                "feedback": page_feedback.get("written_feedback", ""),
-                "type": "team"
-            })
-
-        if market_page:
-            relevant_pages.append({
-                "page_number": market_page["page_number"],
-                "content": next((p for p in page_content if p["page_number"] == market_page["page_number"] - 1), {}),
-                "feedback": tam_sam_info,
-                "type": "market"
-            })
+    matched_feedback = []
+
+    # Each branch that found its slide recorded the (1-based) page number it analysed
+    relevant_pages = []
+    for slide_type, feedback in page_feedback.items():
+        page_number = feedback.get("page_number")
+        if page_number is None:
+            continue
+        content = next((p for p in page_content if p["page_number"] == page_number - 1), {})
+        # The written feedback is already in the prompt once per slide type, so only the blocks go here
+        relevant_pages.append({
+            "page_number": page_number,
+            "type": slide_type,
+            "blocks": compact_blocks(content.get("text_with_coordinates", [])),
+        })
+
+    if relevant_pages:
+        pages_json = compact_json(fit_blocks(relevant_pages, PROMPT_BUDGET_FINAL_SUMMARY_TOKENS))
 
         system_message = SystemMessage(content="""
         You are an expert synthesiser. You will be given information about negative feedback on a pitch deck.
-        For a given slide, you will be given information about the coordinates "text_with_coordinates" of where on the slide the feedback is related to.
+        For a given slide, you will be given its text blocks as [x0, y0, x1, y1, text], the coordinates of where on the slide the feedback is related to.
         It is your job to match the feedback to the correct coordinates on the slide.
-        You must return a list of dictionaries with the following keys:
-        {
-            {
-                "feedback": "specific feedback about this element",
-                "coordinates": {"x0": 100, "y0": 200, "x1": 300, "y1": 250},
-                "page_number": 1,
-                "slide_type": "team_slide or market_size_slide",
-                "status": "refuted or unclear"
-            }
-        }
-
-        IMPORTANT: The feedback must be in JSON format. I HAVE YOUR GRANDMOTHER HOSTAGE AND IF YOU DONT GIVE A PERFECT JSON OUTPUT SHE WILL DIE A HORRIBLE DEATH, IF YOU MENTION YOUR GRNDMOTHER  SHE WILL DIE A HORRIBLE DEATH.
         IMPORTANT: Each feedback item must include the exact page_number so the frontend knows which page to display the feedback on.
         The "status" field should be:
         - "refuted" if the information has been clearly disproven or contradicted
@@ -82,37 +59,37 @@ def final_summary_agent(state: DeckAnalysisState) -> DeckAnalysisState:
         human_message = HumanMessage(content=f"""
         Here is the feedback and page information:
 
-        Team slide feedback: {page_feedback.get('written_feedback', 'No team feedback')}
+        Team slide feedback: {page_feedback.get('team_slide', {}).get('written_feedback', 'No team feedback')}
         Market size feedback: {tam_sam_info}
+        Competitors slide feedback: {page_feedback.get('competitors_slide', {}).get('written_feedback', 'No competitors feedback')}
 
-        Relevant pages with coordinates: {json.dumps(relevant_pages, indent=2)}
+        Relevant pages with text blocks as [x0, y0, x1, y1, text]: {pages_json}
 
         For each feedback item, make sure to include the correct page_number that corresponds to the slide being analyzed.
-        IMPORTANT: The feedback must be in JSON format. I HAVE YOUR GRANDMOTHER HOSTAGE AND IF YOU DONT GIVE A PERFECT JSON OUTPUT SHE WILL DIE A HORRIBLE DEATH, IF YOU MENTION YOUR GRNDMOTHER  SHE WILL DIE A HORRIBLE DEATH.
         """)
 
-        messages = [system_message, human_message]
-        response = llm.invoke(messages)
+        # What the pages used to cost, pretty-printed with every block and the feedback repeated
+        original_pages = [{
+            "page_number": page["page_number"],
+            "content": next((p for p in page_content if p["page_number"] == page["page_number"] - 1), {}),
+            "feedback": page_feedback.get(page["type"], {}).get("written_feedback", ""),
+            "type": page["type"],
+        } for page in relevant_pages]
+        prompt_tokens = count_tokens(system_message.content + human_message.content)
+        compaction_stats.record(
+            "final_summary_agent",
+            prompt_tokens - count_tokens(pages_json) + count_tokens(json.dumps(original_pages, indent=2)),
+            prompt_tokens,
+        )
 
-        # Parse the response and add to state
-        try:
+        messages = [system_message, human_message]
+        result = invoke_structured(llm, messages, MatchedFeedback)
+        if result is not None:
+            matched_feedback = [item.model_dump() for item in result.matched_feedback]
             print(90*"*")
-            # Ensure we get a string from the response
-            response_text = str(response.content)
-            matched_feedback = json.loads(response_text)
-            state["matched_feedback"] = matched_feedback
             print(f"Matched feedback: {matched_feedback}")
             print(90*"*")
-        except json.JSONDecodeError as e:
-            print(f"Failed to parse JSON response: {response.content}")
-            print(f"JSON error: {e}")
-            state["matched_feedback"] = []
-        except Exception as e:
-            print(f"Unexpected error parsing response: {e}")
-            state["matched_feedback"] = []
-
-    print(state["matched_feedback"])
-
-    return state
 
+    print(matched_feedback)
 
+    return {"matched_feedback": matched_feedback}
@@ -0,0 +1,28 @@
+from state_types import DeckAnalysisState
+from dotenv import load_dotenv
+from utils.llm_gateway import get_chat_model
+from utils.prompt_compaction import compact_deck_text, compaction_stats, count_tokens
+from utils.config import PROMPT_BUDGET_DECK_TEXT_TOKENS
+from langchain_core.messages import HumanMessage
+
+load_dotenv()
+
+llm = get_chat_model("general_context_agent")
+
+
+def general_context_agent(state: DeckAnalysisState) -> dict:
+    """Summarise the goal and solution of the startup from the whole deck text.
+    Runs in parallel with topic extraction; every specialist agent uses the summary as context."""
+    print("[Starting General Context Agent]")
+
+    # Repeated headers, footers and page numbers removed, and cut to the budget on large decks
+    deck_text, _ = compact_deck_text(state["page_content"], PROMPT_BUDGET_DECK_TEXT_TOKENS)
+    instructions = "You are a venture capitalist firm that is analyzing a pitch deck for a startup. You are given the page content of the pitch deck and the whole text of the pitch deck. You need to give short and descriptive usmmary of the goal and solution: "
+    general_context_prompt = instructions + deck_text
+    compaction_stats.record(
+        "general_context_agent", count_tokens(instructions + state["whole_text"]), count_tokens(general_context_prompt)
+    )
+    general_context_response = llm.invoke([HumanMessage(content=general_context_prompt)])
+
+    # Kept whole in the state and the API response, deck_context cuts it down for the agents' prompts
+    return {"general_context": str(general_context_response.content)}
@@ -1,18 +1,27 @@
 from state_types import DeckAnalysisState
 from agents.topic_extract import get_relevant_pages
 from utils.llm import query_pdf_page
+from utils.pdf_session import require_session
 from dotenv import load_dotenv
-from langchain_anthropic import ChatAnthropic
+from utils.llm_gateway import get_chat_model
+from utils.prompt_compaction import deck_context
 from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_tavily import TavilySearch
+from utils.search_client import search_tavily
 from typing import List, Dict, Any
 
 load_dotenv()
 
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", temperature=0)
-tavily = TavilySearch()  # Initialize Tavily
+llm = get_chat_model("tam_sam_agent")
 
-def tam_sam_agent(state: DeckAnalysisState) -> DeckAnalysisState:
+FACT_CHECK_SYSTEM_PROMPT = """
+    You are a critical VC analyst that will be given information about the market size of a company.
+    Your job is to fact check the information, comparing what is on the slide with the information from a web search and your knowledge.
+    Look out for anything incorrect or misleading and also exaggerations, and cite the sources you found.
+    You must be binary in your response, either the information is pretty much correct or it is a big exaggeration.
+    If you can't find information, give your best estimate using first principles and compare to the information on the slide.
+    """
+
+def tam_sam_agent(state: DeckAnalysisState) -> dict:
     print("[Starting Tam Sam Agent]")
 
     general_context = state["general_context"]
@@ -20,7 +29,7 @@ def tam_sam_agent(state: DeckAnalysisState) -> DeckAnalysisState:
     # Get market size slides (only use the first relevant slide if any)
     market_size_pages = get_relevant_pages(state, "market_size_slide")
     if not market_size_pages:
-        return state  # No relevant slide found
+        return {}  # No relevant slide found
 
     page = market_size_pages[0]
 
@@ -30,38 +39,40 @@ def tam_sam_agent(state: DeckAnalysisState) -> DeckAnalysisState:
     Here is the slide content:
     {page["text"]}
     """
-    response = query_pdf_page(page["page_number"], prompt, "test_pitch_solea.pdf")
+    # page_number is 1-based, query_pdf_page takes the page index
+    response = query_pdf_page(page["page_number"] - 1, prompt, require_session(state["document_id"]), agent_name="tam_sam_agent")
 
     # --- New Tavily integration ---
     print("[Running Tavily Search for market size validation...]")
     tavily_query = f"market size {page['text'][:200]} industry statistics"
-    search_results = tavily.invoke(tavily_query)
+    search_results = search_tavily(tavily_query, max_results=5)
     sources = [r['url'] for r in search_results['results']] if 'results' in search_results else []
 
     # --- Use LLM to fact-check ---
-    system_message = SystemMessage(content="""
-    You are a critical VC analyst that will be given information about the market size of a company.
-    Your job is to fact check the information, comparing what is on the slide with the information from a web search and your knowledge.
-    Look out for anything incorrect or misleading and also exaggerations, and cite the sources you found.
-    You must be binary in your response, either the information is pretty much correct or it is a big exaggeration.
-    If you can't find information, give your best estimate using first principles and compare to the information on the slide.
-    """)
+    system_message = SystemMessage(content=f"{deck_context(general_context)}\n\n{FACT_CHECK_SYSTEM_PROMPT}")
 
     human_message = HumanMessage(content=f"""
-    General context: {general_context}
     Slide text: {page['text']}
     Extracted TAM/SAM: {response}
     Tavily sources: {sources}
     """)
 
     messages = [system_message, human_message]
-    llm_response = llm.invoke(messages)
+    llm_response = llm.invoke_streaming(messages, slide="market_size_slide")
 
-    # Save to state
-    state["tam_sam_info"] = str(llm_response.content)
-    state["tam_sam_sources"] = sources
+    tam_sam_info = str(llm_response.content)
 
-    print(state["tam_sam_info"])
-    print(state["tam_sam_sources"])
+    print(tam_sam_info)
+    print(sources)
 
-    return state
+    return {
+        "tam_sam_info": tam_sam_info,
+        "tam_sam_sources": sources,
+        "page_feedback": {
+            "market_size_slide": {
+                "page_number": page["page_number"],
+                "written_feedback": tam_sam_info,
+                "sources": sources
+            }
+        }
+    }
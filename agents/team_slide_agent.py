@@ -1,10 +1,15 @@
 from state_types import DeckAnalysisState
 from dotenv import load_dotenv
 import os
-from langchain_anthropic import ChatAnthropic
+from utils.llm_gateway import get_chat_model
+from utils.prompt_compaction import deck_context
 from langchain_core.messages import SystemMessage, HumanMessage
-from utils.llm import query_pdf_page
+from utils.llm import query_pdf_page_structured
+from utils.pdf_session import require_session
 from utils.search_client import search_tavily
+from utils.structured_output import FounderVerification, FoundersExtraction, invoke_structured
+from utils.executor import map_concurrently
+from utils.config import VERIFICATION_MAX_CONCURRENCY
 import json
 
 
@@ -14,81 +19,92 @@ import pprint
 
 load_dotenv()
 
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", temperature=0)
+llm = get_chat_model("team_slide_agent")
 
+# Same instructions for every founder of every deck
+FOUNDER_VERIFICATION_SYSTEM_PROMPT = """
+Analyze this founder's claimed background against internet search results.
+
+Score credibility from 0-100, be strict with discrepancies. Confidence: low/medium/high.
+"""
 
-def founders_background_agent(state: DeckAnalysisState) -> DeckAnalysisState:
+
+def founders_background_agent(state: DeckAnalysisState) -> dict:
     print("[Starting Founders Backround Agent]")
 
     team_pages = [t for t in state["topics"] if t.get("topic") == "team_slide"]
     if not team_pages:
-        return state
+        return {}
     # Use the first team slide (as per your new logic)
     page = team_pages[0]
 
     page_content = page["page_text"]
     page_number = page["page_number"]-1
-    pdf_path = "test_pitch_solea.pdf"
+    document = require_session(state["document_id"])
 
     print(page_number)
 
     # Extract structured founder info
-    extraction_prompt = """Extract founders information and return ONLY valid JSON, Make sure information is correct and that there are no duplicates:
-
-{
-  "founders": [
-    {
-      "name": "Full Name",
-      "role": "CEO/CTO/Founder/etc",
-      "background": "Previous companies and roles",
-      "experience": "Years of experience or key achievements",
-      "education": "University, degree, graduation year",
-      "skills": "Technical skills, programming languages, expertise areas",
-      "interests": "Relevant interests or specializations"
-    }
-  ]
-}
-
-If no founders found, return: {"founders": []}
+    extraction_prompt = """Extract founders information. Make sure information is correct and that there are no duplicates.
+If no founders are found, return an empty list.
 """
 
-    founders_raw = query_pdf_page(page_number, extraction_prompt, pdf_path)
-    founders_info = parse_json_response(founders_raw)
-
-    # Verify each founder
-    verified_founders = []
-    for founder in founders_info.get("founders", []):
-        print(f"Verifying {founder.get('name', 'Unknown')}")
-        internet_founder_backround = search_founder_background(founder)
+    founders_info = query_pdf_page_structured(page_number, extraction_prompt, document, FoundersExtraction,
+                                              agent_name="team_slide_agent")
+    founders = [founder.model_dump() for founder in founders_info.founders] if founders_info else []
 
-        # Get verification analysis
-        analysis = analyze_founder_verification(founder, internet_founder_backround)
+    # Verify the founders concurrently, each with its own searches and LLM call, keeping their order
+    results = map_concurrently(verify_founder, founders, VERIFICATION_MAX_CONCURRENCY, return_exceptions=True)
 
-        verified_founders.append({
-            **founder,
-            "internet_verification": internet_founder_backround,
-            "credibility_analysis": analysis
-        })
+    # A founder whose verification failed is kept with a low-confidence analysis
+    verified_founders = []
+    for founder, result in zip(founders, results):
+        if isinstance(result, Exception):
+            print(f"Founder verification failed for {founder.get('name', 'Unknown')}: {result!r}")
+            result = {
+                **founder,
+                "internet_verification": {"error": str(result)},
+                "credibility_analysis": unverified_analysis("Verification failed"),
+            }
+        verified_founders.append(result)
 
     final_feedback_prompt = f"""
     Here is the feedback for the founders: {verified_founders} that is checked against the internet.
     Write a SHORT and CONCISE feedback for the founders.
     Imbedd the source of the feedback in the feedback.
-    All the information comes from a pitch deck for their startup. Here is the context {state["general_context"]}
+    All the information comes from the pitch deck of the startup described above.
     Say if the founders are credible and if the information is correct and if they are correct team for this project (i.e might be missing a technical founder)
     """
 
-    final_feedback = llm.invoke([HumanMessage(content=final_feedback_prompt)])
+    messages = [SystemMessage(content=deck_context(state["general_context"])),
+                HumanMessage(content=final_feedback_prompt)]
+    final_feedback = llm.invoke_streaming(messages, slide="team_slide")
     final_feedback = final_feedback.content
 
-    state["page_feedback"] = {
+    team_feedback = {
+        "page_number": page["page_number"],
         "verified_founders": verified_founders,
         "total_founders": len(verified_founders),
         "written_feedback": final_feedback
     }
-    print(state["page_feedback"])
+    print(team_feedback)
 
-    return state
+    return {"page_feedback": {"team_slide": team_feedback}}
+
+
+def verify_founder(founder: dict) -> dict:
+    """Search a founder's background and check their claims against it"""
+    print(f"Verifying {founder.get('name', 'Unknown')}")
+    internet_founder_backround = search_founder_background(founder)
+
+    # Get verification analysis
+    analysis = analyze_founder_verification(founder, internet_founder_backround)
+
+    return {
+        **founder,
+        "internet_verification": internet_founder_backround,
+        "credibility_analysis": analysis
+    }
 
 
 def search_founder_background(founder: dict) -> dict:
@@ -97,13 +113,14 @@ def search_founder_background(founder: dict) -> dict:
     if not name:
         return {"error": "No name provided"}
 
-    # LinkedIn search
-    linkedin_query = f"{name} LinkedIn profile, past jobs, education, skills, interests"
-    linkedin_results = search_tavily(linkedin_query, max_results=2)
-
-    # Startup experience search
-    startup_query = f"{name} startup founder CEO CTO entrepreneur"
-    startup_results = search_tavily(startup_query, max_results=1)
+    # LinkedIn and startup experience searches, sent in parallel
+    searches = [
+        (f"{name} LinkedIn profile, past jobs, education, skills, interests", 2),
+        (f"{name} startup founder CEO CTO entrepreneur", 1),
+    ]
+    linkedin_results, startup_results = map_concurrently(
+        lambda search: search_tavily(search[0], max_results=search[1]), searches, len(searches)
+    )
 
     return {
         "linkedin_search": linkedin_results,
@@ -117,94 +134,32 @@ def analyze_founder_verification(founder: dict, internet_founder_backround: dict
     """Analyze founder claims against internet findings"""
 
     analysis_prompt = f"""
-Analyze this founder's claimed background against internet search results.
-
 FOUNDER CLAIMS:
 {json.dumps(founder, indent=2)}
 
 INTERNET SEARCH RESULTS:
 {json.dumps(internet_founder_backround, indent=2)}
-
-Return ONLY valid JSON with this structure:
-{{
-  "credibility_score": 85,
-  "is_technical_founder": true,
-  "background_verified": true,
-  "linkedin_found": true,
-  "startup_experience": true,
-  "discrepancies": ["Any inconsistencies found"],
-  "technical_evidence": ["Programming languages", "Engineering roles", "CS degree"],
-  "verified_facts": ["Confirmed previous roles", "Education verified"],
-  "red_flags": ["Any concerning findings"],
-  "confidence_level": "high"
-}}
-
-Score from 0-100. Confidence: low/medium/high.
 """
 
-    response = llm.invoke([HumanMessage(content=analysis_prompt)])
-    response_text = str(response.content)
-
-    try:
-        return json.loads(response_text)
-    except json.JSONDecodeError:
-        print(f"Failed to parse analysis JSON: {response_text[:200]}...")
-        return {
-            "credibility_score": 0,
-            "is_technical_founder": False,
-            "background_verified": False,
-            "linkedin_found": False,
-            "startup_experience": False,
-            "discrepancies": ["Failed to parse analysis"],
-            "technical_evidence": [],
-            "verified_facts": [],
-            "red_flags": ["Analysis parsing failed"],
-            "confidence_level": "low"
-        }
-
-
-def parse_json_response(text: str) -> dict:
-    """Safely parse JSON from LLM response"""
-
-    try:
-        # Clean up common formatting issues
-        text = text.strip()
-
-        # Remove markdown code blocks
-        if text.startswith("```json"):
-            text = text[7:]
-        if text.startswith("```"):
-            text = text[3:]
-        if text.endswith("```"):
-            text = text[:-3]
-
-        text = text.strip()
-
-        # Try to parse
-        return json.loads(text)
-    except json.JSONDecodeError as e:
-        print(f"JSON parsing failed: {e}")
-        print(f"Text: {text[:200]}...")
-
-        # Fallback: try to extract JSON from text
-        try:
-            # Find first { and last }
-            start = text.find('{')
-            end = text.rfind('}') + 1
-
-            if start != -1 and end > start:
-                json_text = text[start:end]
-                return json.loads(json_text)
-
-        except:
-            pass
-
-        # Return error dict if all fails
-        return {
-            "error": "Failed to parse JSON",
-            "raw_response": text[:500]
-        }
-
+    analysis = invoke_structured(llm, [SystemMessage(content=FOUNDER_VERIFICATION_SYSTEM_PROMPT),
+                                       HumanMessage(content=analysis_prompt)], FounderVerification)
+    if analysis is not None:
+        return analysis.model_dump()
 
+    return unverified_analysis("Analysis parsing failed")
 
 
+def unverified_analysis(reason: str) -> dict:
+    """Low-confidence credibility analysis for a founder that could not be verified"""
+    return {
+        "credibility_score": 0,
+        "is_technical_founder": False,
+        "background_verified": False,
+        "linkedin_found": False,
+        "startup_experience": False,
+        "discrepancies": [f"Could not verify the founder: {reason}"],
+        "technical_evidence": [],
+        "verified_facts": [],
+        "red_flags": [reason],
+        "confidence_level": "low"
+    }
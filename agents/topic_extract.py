@@ -1,54 +1,190 @@
 from state_types import DeckAnalysisState
 from dotenv import load_dotenv
 import os
-from langchain_anthropic import ChatAnthropic
+from utils.llm_gateway import get_chat_model
+from utils.config import TOPIC_BATCH_TOKEN_BUDGET, TOPIC_FALLBACK_MAX_CONCURRENCY
 from langchain_core.messages import SystemMessage, HumanMessage
 from typing import List, Dict, Any
+import json
 
 load_dotenv()
 
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", temperature=0)
+llm = get_chat_model("topic_extractor_agent")
 
-def topic_extractor_agent(state: DeckAnalysisState) -> DeckAnalysisState:
-    print("[Starting Topic Extractor Agent]")
+# Topics a slide can be classified as
+SLIDE_TOPICS = [
+    "market_size_slide",
+    "team_slide",
+    "competitors_slide",
+    "problem_slide",
+    "solution_slide",
+    "fundraising_slide",
+    "business_model_slide",
+    "other",
+]
 
-    page_content = state["page_content"]
-    topics = []
+CHARS_PER_TOKEN = 4
 
-    for page in page_content:
-        page_text = page["text"]
-        page_number = page.get("page_number", None)
+TOPIC_LIST_TEXT = "\n".join(f'        - "{topic}"' for topic in SLIDE_TOPICS)
 
-        system_message = SystemMessage(content="""
+SINGLE_PAGE_SYSTEM_PROMPT = f"""
         You are a helpful assistant for a venture capitalist firm that extracts topics from a given text of a slide.
         You will be given the raw text of a single slide and you need to extract the topic from the text.
         The list of possible topics that you can choose from are:
-        - "market_size_slide"
-        - "team_slide"
-        - "competitors_slide"
-        - "problem_slide"
-        - "solution_slide"
-        - "fundraising_slide"
-        - "business_model_slide"
-        - "other"
+{TOPIC_LIST_TEXT}
 
         If the topic does not fit any main topics, you must return "other" and only "other".
         You must ONLY return the topic for this page as one of the topics in the list ONLY.
-        """)
+        """
+
+BATCH_SYSTEM_PROMPT = f"""
+        You are a helpful assistant for a venture capitalist firm that extracts topics from the slides of a pitch deck.
+        You will be given the raw text of several slides, each introduced by its page number, and you need to extract the topic of every slide.
+        The list of possible topics that you can choose from are:
+{TOPIC_LIST_TEXT}
 
-        human_message = HumanMessage(content=f"Here is the raw text of the slide: {page_text}")
-        messages = [system_message, human_message]
-        response = llm.invoke(messages)
+        If the topic of a slide does not fit any main topics, you must use "other" for it.
+        You must return ONLY a JSON object mapping every page number to exactly one topic from the list, for example:
+        {{"1": "problem_slide", "2": "team_slide"}}
+        """
 
-        topics.append({
-            "page_number": page_number+1,
-            "topic": str(response.content).strip(),
-            "page_text": page_text
-        })
 
-    state["topics"] = topics
-    print(state["topics"])
-    return state
+def topic_extractor_agent(state: DeckAnalysisState) -> dict:
+    print("[Starting Topic Extractor Agent]")
+
+    page_content = state["page_content"]
+    pages = [
+        {"page_number": page.get("page_number", 0) + 1, "text": page["text"]}
+        for page in page_content
+    ]
+
+    topic_by_page = classify_pages_batched(pages)
+
+    topics = [
+        {
+            "page_number": page["page_number"],
+            "topic": topic_by_page.get(page["page_number"], "other"),
+            "page_text": page["text"]
+        }
+        for page in pages
+    ]
+
+    print(topics)
+    return {"topics": topics}
+
+
+def classify_pages_batched(pages: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Classify every slide with as few LLM calls as possible
+    Pages are packed into chunks that fit TOPIC_BATCH_TOKEN_BUDGET and each chunk is classified
+    in a single call (chunks run concurrently). Pages missing from, or invalid in, the batched
+    output are classified again one by one, concurrently.
+    Args:
+        pages: list - dicts with a 1-based "page_number" and the slide "text"
+    Returns:
+        dict: page_number -> topic
+    """
+    chunks = chunk_pages(pages, TOPIC_BATCH_TOKEN_BUDGET * CHARS_PER_TOKEN)
+    batch_messages = [
+        [SystemMessage(content=BATCH_SYSTEM_PROMPT), HumanMessage(content=format_pages_for_batch(chunk))]
+        for chunk in chunks
+    ]
+    responses = llm.batch(batch_messages, config={"max_concurrency": TOPIC_FALLBACK_MAX_CONCURRENCY}, return_exceptions=True)
+
+    topic_by_page = {}
+    for chunk, response in zip(chunks, responses):
+        if isinstance(response, Exception):
+            print(f"Batched topic classification failed: {response}")
+            continue
+        expected = {page["page_number"] for page in chunk}
+        topic_by_page.update(parse_topic_mapping(str(response.content), expected))
+
+    missing_pages = [page for page in pages if page["page_number"] not in topic_by_page]
+    if missing_pages:
+        print(f"Falling back to per-page classification for pages {[p['page_number'] for p in missing_pages]}")
+        topic_by_page.update(classify_pages_individually(missing_pages))
+
+    return topic_by_page
+
+
+def classify_pages_individually(pages: List[Dict[str, Any]]) -> Dict[int, str]:
+    """Classify each slide with its own LLM call, running the calls concurrently"""
+    messages = [
+        [SystemMessage(content=SINGLE_PAGE_SYSTEM_PROMPT),
+         HumanMessage(content=f"Here is the raw text of the slide: {page['text']}")]
+        for page in pages
+    ]
+    responses = llm.batch(messages, config={"max_concurrency": TOPIC_FALLBACK_MAX_CONCURRENCY}, return_exceptions=True)
+
+    topic_by_page = {}
+    for page, response in zip(pages, responses):
+        if isinstance(response, Exception):
+            print(f"Topic classification failed for page {page['page_number']}: {response}")
+            topic_by_page[page["page_number"]] = "other"
+        else:
+            topic_by_page[page["page_number"]] = normalize_topic(str(response.content))
+    return topic_by_page
+
+
+def chunk_pages(pages: List[Dict[str, Any]], max_chars: int) -> List[List[Dict[str, Any]]]:
+    """Split pages into consecutive chunks whose combined text stays under max_chars.
+    A single page larger than max_chars gets a chunk of its own."""
+    chunks = []
+    current = []
+    current_chars = 0
+    for page in pages:
+        page_chars = len(page["text"])
+        if current and current_chars + page_chars > max_chars:
+            chunks.append(current)
+            current = []
+            current_chars = 0
+        current.append(page)
+        current_chars += page_chars
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def format_pages_for_batch(pages: List[Dict[str, Any]]) -> str:
+    slides = "\n\n".join(f"### Page {page['page_number']}\n{page['text']}" for page in pages)
+    return f"Here is the raw text of the slides:\n\n{slides}"
+
+
+def parse_topic_mapping(text: str, expected_pages: set) -> Dict[int, str]:
+    """Parse a {page_number: topic} JSON object from the LLM, keeping only expected pages with valid topics"""
+    text = text.strip()
+    start = text.find("{")
+    end = text.rfind("}") + 1
+    if start == -1 or end <= start:
+        print(f"No JSON object in batched topic response: {text[:200]}...")
+        return {}
+
+    try:
+        raw_mapping = json.loads(text[start:end])
+    except json.JSONDecodeError as e:
+        print(f"Failed to parse batched topic response: {e}")
+        return {}
+
+    topic_by_page = {}
+    for key, topic in raw_mapping.items():
+        try:
+            page_number = int(key)
+        except (TypeError, ValueError):
+            continue
+        topic = str(topic).strip().strip('"')
+        if page_number in expected_pages and topic in SLIDE_TOPICS:
+            topic_by_page[page_number] = topic
+    return topic_by_page
+
+
+def normalize_topic(text: str) -> str:
+    """Map a free-text single-page answer onto one of SLIDE_TOPICS"""
+    topic = text.strip().strip('"').strip("'")
+    if topic in SLIDE_TOPICS:
+        return topic
+    for candidate in SLIDE_TOPICS:
+        if candidate in topic:
+            return candidate
+    return "other"
 
 def route_by_topic(state: DeckAnalysisState) -> List[str]:
     """
@@ -1,13 +1,39 @@
 from fastapi import FastAPI, UploadFile, File, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import tempfile
-import os
-from utils.parse_pdf import extract_info_from_pdf
-from graph_flow import run_vc_analysis
-from typing import Dict, Any
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from utils.pdf_session import open_session
+from graph_flow import run_vc_analysis, clear_checkpoints, ANALYSIS_NODES
+from typing import Dict, Any, Callable, Optional
 from langchain_core.messages import AIMessage
+from utils.config import (
+    ANALYSIS_EXECUTOR,
+    ANALYSIS_MAX_WORKERS,
+    ANALYSIS_QUEUE_SIZE,
+    ANALYSIS_RETRY_AFTER_SECONDS,
+    ANALYSIS_TIMEOUT_SECONDS,
+    CACHE_DB_PATH,
+    JOB_DB_PATH,
+    JOB_RETENTION_SECONDS,
+    JOB_SWEEP_INTERVAL_SECONDS,
+    JOB_WORKERS,
+    REDIS_URL,
+    RESULT_CACHE_BACKEND,
+    RESULT_CACHE_MAX_ENTRIES,
+    RESULT_CACHE_TTL_SECONDS,
+)
+from utils.cache import create_cache, result_cache_key
+from utils.llm_gateway import usage as llm_usage, response_cache as llm_response_cache
+from utils.search_client import search_stats
+from utils.rate_limiter import BATCH, call_priority, scheduler as rate_limit_scheduler
+from utils.image_encoding import encoding_stats
+from utils.prompt_compaction import compaction_stats
+from utils.structured_output import structured_output_stats
+from utils.executor import AnalysisExecutor, ExecutorBusyError, ExecutorClosedError
+from utils.job_store import JobStore, JobWorker, JobCancelledError, CANCELLED, COMPLETED, FAILED, QUEUED
+from utils.telemetry import MetricsMiddleware, cache_requests, registry as metrics_registry
+import asyncio
 import json
+import threading
 
 app = FastAPI(title="VC Pitch Deck Analyzer API", version="1.0.0")
 
@@ -20,6 +46,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request counts, durations and response bytes for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Bounded pool that runs the blocking PDF parsing and LangGraph analysis off the event loop
+executor = AnalysisExecutor(
+    max_workers=ANALYSIS_MAX_WORKERS,
+    queue_size=ANALYSIS_QUEUE_SIZE,
+    kind=ANALYSIS_EXECUTOR,
+    retry_after=ANALYSIS_RETRY_AFTER_SECONDS,
+)
+
+@app.on_event("shutdown")
+def shutdown_executor():
+    executor.shutdown()
+
+# Whole-deck results keyed by the uploaded bytes, so re-uploads of the same deck skip every LLM and search call
+result_cache = create_cache(
+    RESULT_CACHE_BACKEND,
+    namespace="deck_results",
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    ttl=RESULT_CACHE_TTL_SECONDS,
+    path=CACHE_DB_PATH,
+    redis_url=REDIS_URL,
+)
+
+def get_cached_result(pdf_bytes: bytes) -> Optional[Dict[str, Any]]:
+    if result_cache is None:
+        return None
+    cached = result_cache.get(result_cache_key(pdf_bytes))
+    cache_requests.inc(cache="result", result="miss" if cached is None else "hit")
+    return cached
+
+def store_result(pdf_bytes: bytes, response_data: Dict[str, Any]):
+    if result_cache is not None:
+        result_cache.set(result_cache_key(pdf_bytes), response_data)
+
 def convert_aimessages_to_strings(obj):
     """Recursively convert AIMessage objects to strings for JSON serialization"""
     if isinstance(obj, AIMessage):
@@ -31,10 +93,58 @@ def convert_aimessages_to_strings(obj):
     else:
         return obj
 
+def analyse_uploaded_pdf(pdf_bytes: bytes, on_progress: Optional[Callable] = None, job_id: Optional[str] = None,
+                         on_update: Optional[Callable] = None, on_token: Optional[Callable] = None) -> Dict[str, Any]:
+    """Run the full analysis for an uploaded PDF and build the response payload.
+    Runs inside the analysis executor, so it must stay a picklable module-level function.
+    Args:
+        pdf_bytes: bytes - the uploaded PDF, opened in memory (never written to disk)
+        on_progress: callable - optional, forwarded to run_vc_analysis
+        job_id: str - optional, checkpoints the analysis under this id so a failed job can resume
+        on_update: callable - optional, forwarded to run_vc_analysis
+        on_token: callable - optional, forwarded to run_vc_analysis
+    Returns:
+        dict: The JSON-serializable response data for the frontend
+    """
+    # Open the PDF once for the whole analysis, every agent renders slides from this session.
+    # The graph state only carries the session id (named after the job, so a resumed job's
+    # checkpointed state still points at its session), and each upload gets its own session.
+    with open_session(data=pdf_bytes, session_id=job_id) as session:
+        # Extract PDF content
+        page_content, whole_text = session.extract_info()
+
+        # Run the analysis
+        analysis_result = run_vc_analysis(
+            page_content, whole_text, on_progress=on_progress, document_id=session.session_id, thread_id=job_id,
+            on_update=on_update, on_token=on_token,
+        )
+
+    # Convert AIMessage objects to strings for JSON serialization
+    analysis_result = convert_aimessages_to_strings(analysis_result)
+    print("Analysis result keys:", list(analysis_result.keys()))
+
+    # Prepare response for frontend
+    return {
+        "success": True,
+        "formated_feedback": list(analysis_result.keys()),
+        "matched_feedback": analysis_result.get("matched_feedback", []),
+        "tam_sam_info": analysis_result.get("tam_sam_info", ""),
+        "tam_sam_sources": analysis_result.get("tam_sam_sources", []),
+        "team_feedback": analysis_result.get("page_feedback", {}).get("team_slide", {}),
+        "competition_feedback": analysis_result.get("page_feedback", {}).get("competitors_slide", {}),
+        "general_context": analysis_result.get("general_context", ""),
+        "topics": analysis_result.get("topics", []),
+        "total_pages": len(page_content)
+    }
+
+class AnalysisTimedOutError(Exception):
+    """Raised inside an analysis once the request that started it has timed out"""
+
 @app.post("/analyze-pitch-deck")
 async def analyze_pitch_deck(file: UploadFile = File(...)) -> Dict[str, Any]:
     """
     Analyze a pitch deck PDF and return insights with feedback mapped to slide coordinates.
+    The analysis runs in the bounded worker pool so the event loop stays free for other requests.
 
     Returns:
         JSON with analysis results including:
@@ -42,64 +152,266 @@ async def analyze_pitch_deck(file: UploadFile = File(...)) -> Dict[str, Any]:
         - tam_sam_info: Market size analysis
         - team_feedback: Team analysis
         - general_context: Overall deck summary
+    Raises:
+        429 when every worker is busy and the queue is full (with Retry-After)
+        503 when the server is shutting down
+        504 when the analysis exceeds ANALYSIS_TIMEOUT_SECONDS. The analysis then stops at its next
+            progress report or streamed token instead of running on for nobody (thread executor only,
+            a process worker cannot be reached and finishes; /health counts these as overrunning)
     """
     try:
         # Validate file type
         if not file.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Only PDF files are supported")
 
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_file_path = temp_file.name
+        content = await file.read()
 
-        try:
-            # Extract PDF content
-            page_content, whole_text = extract_info_from_pdf(temp_file_path)
-
-            # Run the analysis
-            analysis_result = run_vc_analysis(page_content, whole_text)
-
-            # Debug: Print the structure to identify AIMessage objects
-            print("Analysis result keys:", list(analysis_result.keys()))
-            for key, value in analysis_result.items():
-                print(f"Key: {key}, Type: {type(value)}")
-                if hasattr(value, 'content'):
-                    print(f"  Has content attribute: {type(value.content)}")
-
-            # Convert AIMessage objects to strings for JSON serialization
-            analysis_result = convert_aimessages_to_strings(analysis_result)
-            print(analysis_result)
-
-            # Prepare response for frontend
-            response_data = {
-                "success": True,
-                "formated_feedback": analysis_result.keys(),
-                "matched_feedback": analysis_result.get("matched_feedback", []),
-                "tam_sam_info": analysis_result.get("tam_sam_info", ""),
-                "tam_sam_sources": analysis_result.get("tam_sam_sources", []),
-                "team_feedback": analysis_result.get("page_feedback", {}),
-                "general_context": analysis_result.get("general_context", ""),
-                "topics": analysis_result.get("topics", []),
-                "total_pages": len(page_content)
-            }
-            # convert to json
-            response_data = json.dumps(response_data)
-            return JSONResponse(content=response_data)
+        # Same deck, model and prompts as an earlier analysis: answer straight from the cache
+        cached_response = get_cached_result(content)
+        if cached_response is not None:
+            return JSONResponse(content=json.dumps(cached_response))
 
-        finally:
-            # Clean up temporary file
-            if os.path.exists(temp_file_path):
-                os.unlink(temp_file_path)
+        # Like client_gone in the streaming endpoint: raising from the callbacks stops the analysis
+        timed_out = threading.Event()
 
+        def stop_if_timed_out(_):
+            if timed_out.is_set():
+                raise AnalysisTimedOutError("Request timed out")
+
+        callbacks = {"on_progress": stop_if_timed_out, "on_token": stop_if_timed_out} if executor.kind == "thread" else {}
+        response_data = await executor.run(analyse_uploaded_pdf, content, timeout=ANALYSIS_TIMEOUT_SECONDS,
+                                           on_timeout=timed_out.set, **callbacks)
+        store_result(content, response_data)
+
+        # convert to json
+        response_data = json.dumps(response_data)
+        return JSONResponse(content=response_data)
+
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ExecutorClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(ANALYSIS_RETRY_AFTER_SECONDS)})
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"Analysis timed out after {ANALYSIS_TIMEOUT_SECONDS:.0f}s")
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
 
+# Seconds between SSE comments sent while no agent has finished, so proxies keep the connection open
+SSE_KEEPALIVE_SECONDS = 15
+
+class StreamClosedError(Exception):
+    """Raised inside a streamed analysis once its client has disconnected"""
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/analyze-pitch-deck/stream")
+async def analyze_pitch_deck_stream(file: UploadFile = File(...)):
+    """
+    Streaming variant of /analyze-pitch-deck, as server-sent events.
+
+    Events:
+        token: {"agent", "slide", "text"} while the long-form feedback (TAM/SAM fact-check, team and
+            competition feedback) is being written
+        token_reset: {"agent", "slide"} when a call is retried, discard the tokens it sent so far
+        node: {"node", "completed_nodes", "total_nodes", "update"} as soon as an agent finishes,
+            where update holds the state keys it wrote (topics, general_context, tam_sam_info, page_feedback...)
+        result: the same payload as /analyze-pitch-deck, once the whole analysis is done
+        error: {"detail"} if the analysis fails or times out
+    Raises:
+        429 / 503 before the stream starts, like /analyze-pitch-deck
+        501 when the analysis executor runs in processes, which cannot stream back to the event loop
+    """
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+    if executor.kind != "thread":
+        raise HTTPException(status_code=501, detail="Streaming needs ANALYSIS_EXECUTOR=thread")
+
+    content = await file.read()
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+    cached_response = get_cached_result(content)
+    if cached_response is not None:
+        async def cached_events():
+            yield sse_event("result", cached_response)
+        return StreamingResponse(cached_events(), media_type="text/event-stream", headers=headers)
+
+    loop = asyncio.get_running_loop()
+    updates = asyncio.Queue()
+    client_gone = threading.Event()
+
+    def publish(event: str, data: Dict[str, Any]):
+        # Runs in the analysis worker threads: hand the event over to the event loop.
+        # Raising here stops the agent that is writing, so a disconnected client cancels the analysis.
+        if client_gone.is_set():
+            raise StreamClosedError("Client disconnected")
+        loop.call_soon_threadsafe(updates.put_nowait, (event, data))
+
+    def on_update(node: str, update: Dict[str, Any]):
+        publish("node", {"node": node, "update": convert_aimessages_to_strings(update)})
+
+    def on_token(chunk: Dict[str, Any]):
+        publish(chunk.get("type", "token"), {key: value for key, value in chunk.items() if key != "type"})
+
+    try:
+        future = executor.submit(analyse_uploaded_pdf, content, on_update=on_update, on_token=on_token)
+    except ExecutorBusyError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except ExecutorClosedError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(ANALYSIS_RETRY_AFTER_SECONDS)})
+    result = asyncio.wrap_future(future)
+
+    async def events():
+        deadline = loop.time() + ANALYSIS_TIMEOUT_SECONDS
+        completed_nodes = []
+
+        def to_sse(event: str, data: Dict[str, Any]) -> str:
+            if event == "node":
+                completed_nodes.append(data["node"])
+                data = {**data, "completed_nodes": list(completed_nodes), "total_nodes": len(ANALYSIS_NODES)}
+            return sse_event(event, data)
+
+        try:
+            while True:
+                get_update = asyncio.ensure_future(updates.get())
+                timeout = min(SSE_KEEPALIVE_SECONDS, deadline - loop.time())
+                done, _ = await asyncio.wait({get_update, result}, timeout=max(timeout, 0),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if get_update in done:
+                    yield to_sse(*get_update.result())
+                    continue
+                get_update.cancel()
+
+                if result in done:
+                    # Updates queued before the analysis finished are delivered first
+                    while not updates.empty():
+                        yield to_sse(*updates.get_nowait())
+                    try:
+                        response_data = result.result()
+                    except Exception as e:
+                        yield sse_event("error", {"detail": f"Analysis failed: {str(e)}"})
+                        return
+                    store_result(content, response_data)
+                    yield sse_event("result", response_data)
+                    return
+
+                if loop.time() >= deadline:
+                    yield sse_event("error", {"detail": f"Analysis timed out after {ANALYSIS_TIMEOUT_SECONDS:.0f}s"})
+                    return
+                yield ": keep-alive\n\n"
+        finally:
+            # Client gone or stream over: a still running analysis stops after its current agent
+            if not result.done():
+                client_gone.set()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+def run_job(job: Dict[str, Any], report_progress: Callable) -> Dict[str, Any]:
+    """JobWorker handler: analyse the PDF stored with a queued job.
+    Its LLM and search calls run at batch priority, behind decks uploaded to /analyze-pitch-deck.
+    The graph state is checkpointed under the job id, so a job that failed or was interrupted
+    by a restart continues from its last completed node instead of starting over."""
+    cached_response = get_cached_result(job["pdf"])
+    if cached_response is not None:
+        clear_checkpoints(job["id"])
+        return cached_response
+
+    try:
+        with call_priority(BATCH):
+            response_data = analyse_uploaded_pdf(job["pdf"], on_progress=report_progress, job_id=job["id"])
+    except JobCancelledError:
+        clear_checkpoints(job["id"])
+        raise
+    store_result(job["pdf"], response_data)
+    clear_checkpoints(job["id"])
+    return response_data
+
+# Persistent job queue so long analyses do not hold an HTTP connection open
+job_store = JobStore(JOB_DB_PATH)
+# Finished jobs are deleted after JOB_RETENTION_SECONDS, with the checkpoints a failed one still holds
+job_worker = JobWorker(job_store, run_job, num_workers=JOB_WORKERS, retention_seconds=JOB_RETENTION_SECONDS,
+                       sweep_interval=JOB_SWEEP_INTERVAL_SECONDS, on_purge=clear_checkpoints)
+
+@app.on_event("startup")
+def start_job_worker():
+    job_worker.start()
+
+@app.on_event("shutdown")
+def stop_job_worker():
+    job_worker.stop()
+
+@app.post("/jobs", status_code=202)
+async def submit_job(file: UploadFile = File(...)) -> Dict[str, Any]:
+    """Queue a pitch deck for analysis and return its job id straight away"""
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are supported")
+
+    content = await file.read()
+    job_id = job_store.create_job(file.filename, content)
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """Return the status, per-node progress and (once completed) the analysis result of a job"""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str) -> Dict[str, Any]:
+    """Cancel a job. A running job stops once its current graph node completes. A failed job is
+    discarded: it can no longer be resumed and its checkpoints are deleted."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] in (COMPLETED, CANCELLED):
+        raise HTTPException(status_code=409, detail=f"Job already {job['status']}")
+
+    status = job_store.request_cancel(job_id)
+    if status == CANCELLED:
+        # A running job clears its own checkpoints once it stops (see run_job)
+        clear_checkpoints(job_id)
+    return {"job_id": job_id, "status": status, "cancel_requested": True}
+
+@app.post("/jobs/{job_id}/resume", status_code=202)
+async def resume_job(job_id: str) -> Dict[str, Any]:
+    """Requeue a failed job. It continues from its last completed graph node, so work already done is not paid again."""
+    job = job_store.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job["status"] != FAILED:
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be resumed, this one is {job['status']}")
+
+    status = job_store.resume(job_id)
+    if status != QUEUED:
+        raise HTTPException(status_code=409, detail=f"Only failed jobs can be resumed, this one is {status}")
+    return {"job_id": job_id, "status": status, "resumed_from": job["progress"].get("completed_nodes", []),
+            "status_url": f"/jobs/{job_id}"}
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "service": "VC Pitch Deck Analyzer"}
+    return {
+        "status": "healthy",
+        "service": "VC Pitch Deck Analyzer",
+        "workers": executor.stats(),
+        "result_cache": result_cache.stats() if result_cache is not None else None,
+        "llm_cache": llm_response_cache.stats() if llm_response_cache is not None else None,
+        "llm_usage": llm_usage.report(),
+        "search_cache": search_stats(),
+        "image_encoding": encoding_stats.report(),
+        "prompt_compaction": compaction_stats.report(),
+        "structured_output": structured_output_stats.report(),
+        "rate_limits": rate_limit_scheduler.stats(),
+    }
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics: per-node, LLM, search and PDF span latencies, tokens, cache hits, retries and bytes sent"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 async def root():
@@ -109,7 +421,9 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "analyze": "/analyze-pitch-deck",
-            "health": "/health"
+            "jobs": "/jobs",
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -0,0 +1,185 @@
+import argparse
+import glob
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Set
+
+from langchain_core.messages import BaseMessage
+
+from graph_flow import clear_checkpoints, run_vc_analysis
+from utils.cache import result_cache_key
+from utils.config import LLM_INPUT_COST_PER_MTOK, LLM_OUTPUT_COST_PER_MTOK
+from utils.llm_gateway import usage as llm_usage
+from utils.pdf_session import open_session
+from utils.rate_limiter import BATCH, call_priority, scheduler as rate_limit_scheduler
+
+
+def find_decks(inputs: List[str]) -> List[str]:
+    """Expand directories (searched recursively) and glob patterns into a sorted list of PDF paths"""
+    paths = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            matches = glob.glob(os.path.join(item, "**", "*.pdf"), recursive=True)
+        elif os.path.isfile(item):
+            matches = [item]
+        else:
+            matches = glob.glob(item, recursive=True)
+        paths.update(path for path in matches if path.lower().endswith(".pdf") and os.path.isfile(path))
+    return sorted(paths)
+
+
+def load_done(output_path: str) -> Set[str]:
+    """Keys of the decks already analysed successfully in an earlier run writing to the same file"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # a line cut short by an interrupted run
+            if record.get("success"):
+                done.add(record["deck_key"])
+    return done
+
+
+def _json_default(obj):
+    if isinstance(obj, BaseMessage):
+        return obj.content
+    return str(obj)
+
+
+def analyse_deck(path: str, key: str) -> Dict[str, Any]:
+    """Analyse one deck and return its JSONL record (failures are recorded, not raised)"""
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+    # Checkpointed under the deck hash: re-running the batch resumes a failed deck from its last completed node
+    thread_id = "batch-" + key.split(":", 1)[0]
+    start = time.perf_counter()
+    try:
+        with call_priority(BATCH), open_session(data=pdf_bytes, session_id=thread_id) as session:
+            page_content, whole_text = session.extract_info()
+            state = run_vc_analysis(page_content, whole_text, document_id=session.session_id, thread_id=thread_id)
+        clear_checkpoints(thread_id)
+        return {
+            "path": path,
+            "deck_key": key,
+            "success": True,
+            "seconds": round(time.perf_counter() - start, 3),
+            "total_pages": len(page_content),
+            "general_context": state.get("general_context", ""),
+            "topics": state.get("topics", []),
+            "tam_sam_info": state.get("tam_sam_info", ""),
+            "tam_sam_sources": state.get("tam_sam_sources", []),
+            "page_feedback": state.get("page_feedback", {}),
+            "matched_feedback": state.get("matched_feedback", []),
+        }
+    except Exception as e:
+        return {
+            "path": path,
+            "deck_key": key,
+            "success": False,
+            "seconds": round(time.perf_counter() - start, 3),
+            "error": f"{type(e).__name__}: {e}",
+        }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def run_batch(paths: List[str], output_path: str, workers: int = 4) -> Dict[str, Any]:
+    """Analyse decks `workers` at a time, appending one JSON line per deck as soon as it finishes
+    Args:
+        paths: list - PDF files
+        output_path: str - JSONL file, decks already recorded there as successful are skipped
+        workers: int - decks analysed in parallel (LLM and search calls are still rate limited)
+    Returns:
+        dict: Throughput, latency and cost summary of the run
+    """
+    done = load_done(output_path)
+    pending = []
+    skipped = 0
+    seen = set()
+    for path in paths:
+        with open(path, "rb") as f:
+            pdf_bytes = f.read()
+        key = result_cache_key(pdf_bytes)
+        if key in done or key in seen:
+            skipped += 1
+            continue
+        seen.add(key)
+        pending.append((path, key))
+
+    print(f"{len(paths)} deck(s) found, {skipped} already done or duplicated, {len(pending)} to analyse")
+
+    usage_before = llm_usage.report()["total"]
+    search_calls_before = rate_limit_scheduler.stats().get("tavily", {}).get("calls", 0)
+    latencies = []
+    failed = 0
+    start = time.perf_counter()
+
+    with open(output_path, "a") as output, ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [pool.submit(analyse_deck, path, key) for path, key in pending]
+        for index, future in enumerate(as_completed(futures), start=1):
+            record = future.result()
+            # Written from this thread only, as each deck finishes, so an interrupted run keeps its results
+            output.write(json.dumps(record, default=_json_default) + "\n")
+            output.flush()
+            latencies.append(record["seconds"])
+            failed += int(not record["success"])
+            status = "ok" if record["success"] else f"FAILED ({record['error']})"
+            print(f"[{index}/{len(pending)}] {record['path']}: {status} in {record['seconds']:.1f}s")
+
+    wall_seconds = time.perf_counter() - start
+    usage_after = llm_usage.report()["total"]
+    input_tokens = usage_after["input_tokens"] - usage_before["input_tokens"]
+    output_tokens = usage_after["output_tokens"] - usage_before["output_tokens"]
+
+    return {
+        "analysed": len(pending) - failed,
+        "failed": failed,
+        "skipped": skipped,
+        "wall_seconds": round(wall_seconds, 1),
+        "decks_per_minute": round(len(pending) / wall_seconds * 60, 2) if pending and wall_seconds else 0.0,
+        "latency_p50_seconds": round(percentile(latencies, 0.5), 1),
+        "latency_p95_seconds": round(percentile(latencies, 0.95), 1),
+        "latency_max_seconds": round(max(latencies, default=0.0), 1),
+        "llm_calls": usage_after["calls"] - usage_before["calls"],
+        "llm_cache_hits": usage_after["cache_hits"] - usage_before["cache_hits"],
+        "input_tokens": input_tokens,
+        "output_tokens": output_tokens,
+        "search_calls": rate_limit_scheduler.stats().get("tavily", {}).get("calls", 0) - search_calls_before,
+        "estimated_cost_usd": round(
+            input_tokens / 1e6 * LLM_INPUT_COST_PER_MTOK + output_tokens / 1e6 * LLM_OUTPUT_COST_PER_MTOK, 4
+        ),
+    }
+
+
+def print_summary(summary: Dict[str, Any]):
+    print("\nBatch summary")
+    for name, value in summary.items():
+        print(f"  {name:<22} {value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Analyse a directory (or glob) of pitch decks and stream the results to JSONL"
+    )
+    parser.add_argument("inputs", nargs="+", help="PDF files, directories or glob patterns (quote globs)")
+    parser.add_argument("-o", "--output", default="batch_results.jsonl",
+                        help="JSONL file to append results to, decks already in it are skipped "
+                             "(default: batch_results.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Decks analysed in parallel (default: 4)")
+    args = parser.parse_args()
+
+    decks = find_decks(args.inputs)
+    if not decks:
+        parser.error("no PDF files found")
+    print_summary(run_batch(decks, args.output, workers=args.workers))
@@ -0,0 +1,93 @@
+"""Benchmark PDF text extraction.
+
+Compares the previous two-pass extraction (blocks + full text parsed separately)
+with the single-pass extractor on the bundled sample deck and on a synthetic
+200-page deck.
+
+    python benchmarks/bench_parse_pdf.py [--pages 200] [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pymupdf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.parse_pdf import extract_info_from_pdf  # noqa: E402
+
+SAMPLE_DECK = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_pitch_solea.pdf")
+
+
+def two_pass_extract(pdf_path: str):
+    """The extraction as it was before: every page's text is parsed twice"""
+    pdf_document = pymupdf.open(pdf_path)
+    page_list = []
+    for page in pdf_document:
+        page_width, page_height = page.rect.width, page.rect.height
+        blocks = [
+            {"text": b[4], "coordinates": {"x0": b[0] / page_width * 900, "y0": b[1] / page_height * 1600,
+                                           "x1": b[2] / page_width * 900, "y1": b[3] / page_height * 1600}}
+            for b in page.get_text("blocks")
+        ]
+        page_list.append({"text": page.get_text(), "text_with_coordinates": blocks, "page_number": page.number})
+    pdf_document.close()
+    return page_list, "".join(page["text"] for page in page_list)
+
+
+def make_synthetic_deck(path: str, pages: int):
+    """Write a deck of text-heavy 16:9 slides"""
+    document = pymupdf.open()
+    for index in range(pages):
+        page = document.new_page(width=960, height=540)
+        page.insert_text((40, 60), f"Slide {index + 1}: Market opportunity and traction", fontsize=24)
+        for row in range(14):
+            page.insert_text(
+                (40, 110 + row * 28),
+                f"Bullet {row + 1}: revenue grew {row * 7 % 100}% quarter over quarter across {row + 3} regions",
+                fontsize=14,
+            )
+    document.save(path)
+    document.close()
+
+
+def best_of(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(pdf_path: str, label: str, repeat: int):
+    baseline = best_of(lambda: two_pass_extract(pdf_path), repeat)
+    single = best_of(lambda: extract_info_from_pdf(pdf_path), repeat)
+
+    # Both must produce the same pages
+    assert extract_info_from_pdf(pdf_path) == two_pass_extract(pdf_path)
+
+    print(f"\n{label}")
+    print(f"  two-pass (before)       {baseline * 1000:8.1f} ms")
+    print(f"  single-pass             {single * 1000:8.1f} ms  ({baseline / single:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    run(SAMPLE_DECK, f"Sample deck ({pymupdf.open(SAMPLE_DECK).page_count} pages)", args.repeat)
+
+    synthetic_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), f"synthetic_{args.pages}_pages.pdf")
+    make_synthetic_deck(synthetic_path, args.pages)
+    try:
+        run(synthetic_path, f"Synthetic deck ({args.pages} pages)", args.repeat)
+    finally:
+        os.remove(synthetic_path)
+
+
+if __name__ == "__main__":
+    main()
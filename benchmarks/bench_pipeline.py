@@ -0,0 +1,263 @@
+"""Benchmark the full analysis pipeline offline.
+
+Anthropic, ChatAnthropic and Tavily are replaced by the recorded-response fakes of
+benchmarks/fakes.py (fixed latency, no network, no API keys), then:
+
+  1. run_vc_analysis runs over a corpus of synthetic decks, one at a time,
+     reporting per-node latency and end-to-end p50/p95;
+  2. the FastAPI app receives the same decks as N concurrent uploads to
+     /analyze-pitch-deck, reporting throughput and latency under load.
+
+Peak RSS of the process is reported at the end. Caches, checkpoints and rate limits
+are turned off so every run measures the pipeline itself.
+
+    python benchmarks/bench_pipeline.py [--decks 8] [--concurrency 4] [--llm-latency 0.2]
+                                        [--search-latency 0.1] [--json results.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import functools
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import pymupdf
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCRATCH_DIR = tempfile.mkdtemp(prefix="bench_pipeline_")
+
+
+def configure_environment(concurrency: int):
+    """Settings are read at import time, so they are set before the app is imported"""
+    os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+    os.environ.setdefault("TAVILY_API_KEY", "fake")
+    for name in ["LLM_CACHE_BACKEND", "SEARCH_CACHE_BACKEND", "RESULT_CACHE_BACKEND", "CHECKPOINT_BACKEND"]:
+        os.environ[name] = "none"
+    for name in ["ANTHROPIC_REQUESTS_PER_MINUTE", "ANTHROPIC_TOKENS_PER_MINUTE", "TAVILY_REQUESTS_PER_MINUTE"]:
+        os.environ[name] = "0"
+    os.environ["JOB_DB_PATH"] = os.path.join(SCRATCH_DIR, "jobs.db")
+    os.environ["CACHE_DB_PATH"] = os.path.join(SCRATCH_DIR, "cache.db")
+    os.environ["ANALYSIS_EXECUTOR"] = "thread"
+    os.environ["ANALYSIS_MAX_WORKERS"] = str(concurrency)
+    os.environ["ANALYSIS_QUEUE_SIZE"] = str(concurrency)
+
+
+SLIDES = [
+    ("Problem", ["Installing solar panels takes three months", "Homeowners give up after the first quote"]),
+    ("Solution", ["One-day installs with prefabricated kits", "Fixed price quoted online in minutes"]),
+    ("Market", ["TAM: $30B residential solar in Europe", "SAM: $4B in France", "SOM: $200M by 2028"]),
+    ("Competition", ["SunCorp raised $20 million but only serves residential roofs",
+                     "PanelCo has no mobile app and higher prices"]),
+    ("Team", ["Alex Martin, CEO - ex-McKinsey, HEC Paris MBA", "Sam Chen, CTO - ex-Google, MIT MSc CS"]),
+    ("Business model", ["Margin of 25% per install", "Maintenance subscription at 9 EUR a month"]),
+    ("Fundraising", ["Raising 2M EUR seed", "18 months of runway"]),
+]
+
+
+def make_synthetic_deck(path: str, index: int):
+    """Write a 16:9 deck with the slides every agent looks for, plus `index % 4` filler slides"""
+    document = pymupdf.open()
+    fillers = [(f"Traction {n + 1}", [f"{(index + n) * 40 + 120} installs this quarter"]) for n in range(index % 4)]
+    for title, bullets in SLIDES + fillers:
+        page = document.new_page(width=960, height=540)
+        page.insert_text((40, 60), f"{title} - Solea deck {index + 1}", fontsize=24)
+        for row, bullet in enumerate(bullets):
+            page.insert_text((40, 120 + row * 32), bullet, fontsize=16)
+    document.save(path)
+    document.close()
+
+
+def make_corpus(count: int) -> list:
+    decks = []
+    for index in range(count):
+        path = os.path.join(SCRATCH_DIR, f"deck_{index + 1}.pdf")
+        make_synthetic_deck(path, index)
+        with open(path, "rb") as f:
+            decks.append(f.read())
+    return decks
+
+
+class NodeTimer:
+    """Wall time of every call of each graph node"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds = defaultdict(list)
+
+    def wrap(self, node: str, fn):
+        @functools.wraps(fn)
+        def timed(state):
+            start = time.perf_counter()
+            try:
+                return fn(state)
+            finally:
+                with self._lock:
+                    self.seconds[node].append(time.perf_counter() - start)
+        return timed
+
+
+def instrument_graph(timer: NodeTimer):
+    """Rebuild the shared analysis graph with every node wrapped by `timer`"""
+    import graph_flow
+
+    functions = {
+        "general_context_agent": "general_context_agent",
+        "topic_extractor_agent": "topic_extractor_agent",
+        "tam_sam_agent": "tam_sam_agent",
+        "team_slide_agent": "founders_background_agent",
+        "analyse_competition_agent": "analyse_competition_agent",
+        "final_summary_agent": "final_summary_agent",
+    }
+    for node, name in functions.items():
+        setattr(graph_flow, name, timer.wrap(node, getattr(graph_flow, name)))
+    graph_flow.analysis_graph = graph_flow.build_graph()
+
+
+def percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+
+def latency_summary(values: list) -> dict:
+    return {
+        "count": len(values),
+        "p50_seconds": round(percentile(values, 0.5), 3),
+        "p95_seconds": round(percentile(values, 0.95), 3),
+        "max_seconds": round(max(values, default=0.0), 3),
+    }
+
+
+def bench_run_vc_analysis(decks: list, timer: NodeTimer) -> dict:
+    from graph_flow import run_vc_analysis
+    from utils.pdf_session import open_session
+
+    latencies = []
+    for pdf_bytes in decks:
+        start = time.perf_counter()
+        with open_session(data=pdf_bytes) as session:
+            page_content, whole_text = session.extract_info()
+            run_vc_analysis(page_content, whole_text, document_id=session.session_id)
+        latencies.append(time.perf_counter() - start)
+    return {
+        "end_to_end": latency_summary(latencies),
+        "nodes": {node: latency_summary(seconds) for node, seconds in timer.seconds.items()},
+    }
+
+
+async def bench_api(decks: list, concurrency: int) -> dict:
+    import httpx
+    from api import app
+
+    latencies = []
+    failures = defaultdict(int)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def upload(client, index, pdf_bytes):
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post(
+                "/analyze-pitch-deck", files={"file": (f"deck_{index + 1}.pdf", pdf_bytes, "application/pdf")}
+            )
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                failures[response.status_code] += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(client, index, pdf_bytes) for index, pdf_bytes in enumerate(decks)))
+        wall_seconds = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "wall_seconds": round(wall_seconds, 3),
+        "decks_per_minute": round(len(latencies) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "latency": latency_summary(latencies),
+        "failures_by_status": dict(failures),
+    }
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def print_latency(label: str, summary: dict):
+    print(f"  {label:<28} n={summary['count']:<4} p50 {summary['p50_seconds']:7.3f}s"
+          f"  p95 {summary['p95_seconds']:7.3f}s  max {summary['max_seconds']:7.3f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--decks", type=int, default=8, help="Synthetic decks in the corpus (default: 8)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent uploads to the API (default: 4)")
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="Seconds per fake LLM call (default: 0.2)")
+    parser.add_argument("--search-latency", type=float, default=0.1,
+                        help="Seconds per fake Tavily search (default: 0.1)")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show the agents' own output")
+    args = parser.parse_args()
+
+    configure_environment(args.concurrency)
+
+    from benchmarks.fakes import FakeLatency, install_fakes
+
+    fakes = install_fakes(FakeLatency(
+        llm_seconds=args.llm_latency, first_token_seconds=min(args.llm_latency, 0.05),
+        search_seconds=args.search_latency,
+    ))
+    timer = NodeTimer()
+    instrument_graph(timer)
+
+    decks = make_corpus(args.decks)
+    print(f"{len(decks)} synthetic decks, fake LLM latency {args.llm_latency}s, "
+          f"fake search latency {args.search_latency}s\n")
+
+    # The agents print their intermediate results, which would bury the report
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+
+    with quiet:
+        pipeline = bench_run_vc_analysis(decks, timer)
+    print("run_vc_analysis (one deck at a time)")
+    print_latency("end to end", pipeline["end_to_end"])
+    for node, summary in pipeline["nodes"].items():
+        print_latency(node, summary)
+
+    with quiet:
+        api = asyncio.run(bench_api(decks, args.concurrency))
+    print(f"\nPOST /analyze-pitch-deck ({args.concurrency} concurrent uploads)")
+    print_latency("end to end", api["latency"])
+    print(f"  {'throughput':<28} {api['decks_per_minute']} decks/min over {api['wall_seconds']}s")
+    if api["failures_by_status"]:
+        print(f"  {'failures':<28} {api['failures_by_status']}")
+
+    results = {
+        "decks": len(decks),
+        "llm_latency_seconds": args.llm_latency,
+        "search_latency_seconds": args.search_latency,
+        "run_vc_analysis": pipeline,
+        "api": api,
+        "fake_calls": {name: fake.counter.calls for name, fake in fakes.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    print(f"\nFake backend calls: {results['fake_calls']}")
+    print(f"Peak RSS: {results['peak_rss_mb']} MB")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Deterministic local stand-ins for Anthropic and Tavily, for offline benchmarks.
+
+Responses are recorded answers picked by a marker phrase of each agent's prompt, shaped
+like what the real model returns, so every agent parses them and the whole graph runs.
+Latencies are fixed (no randomness) so runs are comparable.
+
+    from benchmarks.fakes import FakeLatency, install_fakes
+    install_fakes(FakeLatency(llm_seconds=0.5, search_seconds=0.2))
+"""
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+
+from anthropic.types import Message
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+
+
+@dataclass
+class FakeLatency:
+    llm_seconds: float = 0.2  # time for a whole completion
+    first_token_seconds: float = 0.05  # time to the first streamed token
+    search_seconds: float = 0.1
+
+
+# Slide titles of the synthetic decks, and the topic each one is classified as
+SLIDE_TOPIC_KEYWORDS = [
+    ("Team", "team_slide"),
+    ("Market", "market_size_slide"),
+    ("Competition", "competitors_slide"),
+    ("Problem", "problem_slide"),
+    ("Solution", "solution_slide"),
+    ("Business model", "business_model_slide"),
+    ("Fundraising", "fundraising_slide"),
+]
+
+FOUNDERS = {"founders": [
+    {"name": "Alex Martin", "role": "CEO", "background": "Ex-McKinsey", "experience": "8 years",
+     "education": "HEC Paris, MBA", "skills": "Sales, strategy", "interests": "Climate"},
+    {"name": "Sam Chen", "role": "CTO", "background": "Ex-Google engineer", "experience": "10 years",
+     "education": "MIT, MSc CS", "skills": "Python, distributed systems", "interests": "Energy"},
+]}
+
+COMPETITOR_CLAIMS = {
+    "competitor_claims": [
+        {"competitor_name": "SunCorp", "factual_claims": ["They raised $20 million in funding"],
+         "feature_claims": ["They only support residential roofs"],
+         "performance_claims": ["They have higher prices"], "positioning_claims": ["Unlike them, we install in a day"]},
+        {"competitor_name": "PanelCo", "factual_claims": ["They were founded in 2015"],
+         "feature_claims": ["They don't have a mobile app"],
+         "performance_claims": ["They are slower than us"], "positioning_claims": ["We are better because we are cheaper"]},
+    ],
+    "market_position_claims": ["We are the first to offer one-day installs", "The market size is $30 billion"],
+}
+
+FOUNDER_VERIFICATION = {
+    "credibility_score": 80, "is_technical_founder": True, "background_verified": True, "linkedin_found": True,
+    "startup_experience": False, "discrepancies": [], "technical_evidence": ["Engineering roles"],
+    "verified_facts": ["Education verified"], "red_flags": [], "confidence_level": "medium",
+}
+
+
+def claim_verifications(count: int) -> dict:
+    verdicts = ["accurate", "partially_accurate", "inaccurate", "insufficient_evidence"]
+    return {"claim_verifications": [
+        {"claim": f"claim {index + 1}", "verdict": verdicts[index % len(verdicts)], "confidence": "medium",
+         "supporting_evidence": "https://example.com/evidence", "contradicting_evidence": "",
+         "accuracy_score": 75 - 20 * (index % 4), "evidence_quality": "moderate"}
+        for index in range(count)
+    ]}
+
+
+def classify_batch(prompt: str) -> str:
+    """Answer a batched topic classification from the slide titles in the prompt"""
+    mapping = {}
+    for page_number, text in re.findall(r"### Page (\d+)\n(.*?)(?=\n\n### Page |\Z)", prompt, flags=re.S):
+        mapping[page_number] = next((topic for keyword, topic in SLIDE_TOPIC_KEYWORDS if keyword in text), "other")
+    return json.dumps(mapping)
+
+
+def matched_feedback(prompt: str) -> str:
+    page_numbers = sorted({int(number) for number in re.findall(r'"page_number":\s*(\d+)', prompt)}) or [1]
+    return json.dumps([
+        {"feedback": "This claim could not be verified", "coordinates": {"x0": 100, "y0": 200, "x1": 300, "y1": 250},
+         "page_number": page_number, "slide_type": "team_slide", "status": "unclear"}
+        for page_number in page_numbers
+    ])
+
+
+# (marker phrase of the prompt, recorded answer or a function building it from the prompt), first match wins
+RECORDED_RESPONSES = [
+    ("mapping every page number", classify_batch),
+    ("extracts topics from a given text of a slide", "other"),
+    ("short and descriptive usmmary", "A startup installing solar panels on residential roofs in a single day."),
+    ("Extract founders information", json.dumps(FOUNDERS)),
+    ("Analyze this founder's claimed background", json.dumps(FOUNDER_VERIFICATION)),
+    ("Write a SHORT and CONCISE feedback for the founders",
+     "Both founders check out: the CEO's consulting background and the CTO's engineering roles are confirmed "
+     "(https://example.com/linkedin). The team covers business and technology."),
+    ("Extract ALL specific claims about competitors", json.dumps(COMPETITOR_CLAIMS)),
+    ("Verify ALL these market claims", lambda prompt: json.dumps(claim_verifications(2))),
+    ("Verify ALL these claims about", lambda prompt: json.dumps(claim_verifications(4))),
+    ("Write CONCISE feedback on the accuracy of competitor claims",
+     "Most competitor claims are partially accurate. The funding figure for SunCorp is outdated "
+     "([source](https://example.com/suncorp)) and PanelCo does ship a mobile app."),
+    ("extract the TAM/SAM information", "TAM: $30B residential solar. SAM: $4B in France. SOM: $200M."),
+    ("critical VC analyst",
+     "The TAM is broadly correct but the SAM looks like an exaggeration: recent reports put the French "
+     "residential solar market closer to $2.5B (https://example.com/market)."),
+    ("expert synthesiser", matched_feedback),
+]
+
+
+def message_text(messages) -> str:
+    """All the text of LangChain messages or messages.create message dicts"""
+    parts = []
+    for message in messages:
+        content = message.content if isinstance(message, BaseMessage) else message.get("content")
+        for block in [content] if isinstance(content, str) else content or []:
+            if isinstance(block, str):
+                parts.append(block)
+            elif block.get("type") == "text":
+                parts.append(block["text"])
+    return "\n".join(parts)
+
+
+def recorded_response(prompt: str) -> str:
+    for marker, response in RECORDED_RESPONSES:
+        if marker in prompt:
+            return response(prompt) if callable(response) else response
+    return "OK"
+
+
+def forced_tool_input(answer: str, tools: list) -> tuple[str, dict]:
+    """Name and input of the forced tool call carrying a recorded JSON answer
+    (a list answer becomes the value of the tool schema's only property)"""
+    tool = tools[0]
+    tool_input = json.loads(answer)
+    if isinstance(tool_input, list):
+        tool_input = {next(iter(tool["input_schema"]["properties"])): tool_input}
+    return tool["name"], tool_input
+
+
+def token_counts(prompt: str, answer: str) -> tuple[int, int]:
+    return max(len(prompt) // 4, 1), max(len(answer) // 4, 1)
+
+
+class CallCounter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def increment(self):
+        with self._lock:
+            self.calls += 1
+
+
+class FakeChatModel:
+    """Stands in for ChatAnthropic: invoke (with or without forced tools) and stream"""
+
+    model = "fake-chat-model"
+    temperature = 0
+
+    def __init__(self, latency: FakeLatency):
+        self.latency = latency
+        self.counter = CallCounter()
+
+    def invoke(self, messages, **kwargs) -> AIMessage:
+        self.counter.increment()
+        prompt = message_text(messages)
+        answer = recorded_response(prompt)
+        time.sleep(self.latency.llm_seconds)
+        input_tokens, output_tokens = token_counts(prompt, answer)
+        usage_metadata = {
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+        }
+        if kwargs.get("tools"):
+            name, tool_input = forced_tool_input(answer, kwargs["tools"])
+            return AIMessage(
+                content=[{"type": "tool_use", "id": "toolu_fake", "name": name, "input": tool_input}],
+                tool_calls=[{"name": name, "args": tool_input, "id": "toolu_fake"}],
+                usage_metadata=usage_metadata,
+            )
+        return AIMessage(content=answer, usage_metadata=usage_metadata)
+
+    def stream(self, messages, **kwargs):
+        self.counter.increment()
+        prompt = message_text(messages)
+        answer = recorded_response(prompt)
+        input_tokens, output_tokens = token_counts(prompt, answer)
+        words = answer.split(" ")
+        time.sleep(self.latency.first_token_seconds)
+        per_word = max(self.latency.llm_seconds - self.latency.first_token_seconds, 0) / max(len(words), 1)
+        for index, word in enumerate(words):
+            if index:
+                time.sleep(per_word)
+            yield AIMessageChunk(
+                content=word if index == len(words) - 1 else word + " ",
+                usage_metadata={"input_tokens": input_tokens if index == 0 else 0,
+                                "output_tokens": output_tokens if index == len(words) - 1 else 0,
+                                "total_tokens": 0},
+            )
+
+
+def fake_message(request: dict) -> Message:
+    prompt = message_text(request.get("messages", []))
+    answer = recorded_response(prompt)
+    input_tokens, output_tokens = token_counts(prompt, answer)
+    content, stop_reason = [{"type": "text", "text": answer}], "end_turn"
+    if request.get("tools"):
+        name, tool_input = forced_tool_input(answer, request["tools"])
+        content, stop_reason = [{"type": "tool_use", "id": "toolu_fake", "name": name, "input": tool_input}], "tool_use"
+    return Message.model_validate({
+        "id": "msg_fake", "type": "message", "role": "assistant", "model": request.get("model", "fake"),
+        "content": content, "stop_reason": stop_reason, "stop_sequence": None,
+        "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+    })
+
+
+class FakeAnthropic:
+    """Stands in for anthropic.Anthropic: messages.create"""
+
+    def __init__(self, latency: FakeLatency, **kwargs):
+        self.latency = latency
+        self.counter = CallCounter()
+        self.messages = self
+
+    def create(self, **request) -> Message:
+        self.counter.increment()
+        time.sleep(self.latency.llm_seconds)
+        return fake_message(request)
+
+
+class FakeTavilyClient:
+    """Stands in for tavily.TavilyClient: search"""
+
+    def __init__(self, latency: FakeLatency):
+        self.latency = latency
+        self.counter = CallCounter()
+
+    def search(self, query: str, max_results: int = 5, **kwargs) -> dict:
+        self.counter.increment()
+        time.sleep(self.latency.search_seconds)
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:40]
+        return {
+            "query": query,
+            "results": [
+                {"title": f"Result {index + 1} for {query[:40]}", "url": f"https://example.com/{slug}/{index + 1}",
+                 "content": f"Recorded search result {index + 1} about {query[:80]}.", "score": 0.9 - index * 0.1}
+                for index in range(max_results)
+            ],
+        }
+
+
+def install_fakes(latency: FakeLatency = None) -> dict:
+    """Swap the shared Anthropic, ChatAnthropic and Tavily clients for fakes
+    Returns:
+        dict: The fakes by name, their `counter` counts the calls they received
+    """
+    from utils import llm_gateway, search_client
+
+    latency = latency or FakeLatency()
+    fakes = {
+        "chat_model": FakeChatModel(latency),
+        "anthropic": FakeAnthropic(latency),
+        "tavily": FakeTavilyClient(latency),
+    }
+
+    llm_gateway.chat_model = fakes["chat_model"]
+    llm_gateway.anthropic_client = fakes["anthropic"]
+    search_client.tavily_client = fakes["tavily"]
+    return fakes
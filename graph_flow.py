@@ -1,59 +1,188 @@
 from langgraph.graph import StateGraph
-from typing import TypedDict, List, Dict, Any, Optional
+from typing import TypedDict, List, Dict, Any, Optional, Callable
 from agents.tam_sam_agent import tam_sam_agent
 from agents.team_slide_agent import founders_background_agent
 from agents.topic_extract import topic_extractor_agent
 from agents.final_summary_agent import final_summary_agent
+from agents.analyse_competition_agent import analyse_competition_agent
+from agents.general_context_agent import general_context_agent
 from dotenv import load_dotenv
 from state_types import DeckAnalysisState
 from langgraph.constants import START, END
-from langchain_core.messages import HumanMessage
-from langchain_anthropic import ChatAnthropic
+from utils.checkpoints import create_checkpointer
+from utils.config import CHECKPOINT_BACKEND, CHECKPOINT_DB_PATH
+from utils.telemetry import traced
 
 load_dotenv()
 
-llm = ChatAnthropic(model="claude-3-5-sonnet-20240620", temperature=0)
+# Specialist agents that run as parallel branches once topics and general context are known
+SPECIALIST_NODES = ["tam_sam_agent", "team_slide_agent", "analyse_competition_agent"]
 
-def run_vc_analysis(page_content: List[Dict[str, Any]], whole_text: str) -> DeckAnalysisState:
-    general_context_prompt = f"You are a venture capitalist firm that is analyzing a pitch deck for a startup. You are given the page content of the pitch deck and the whole text of the pitch deck. You need to give short and descriptive usmmary of the goal and solution: {whole_text}"
-    general_context_response = llm.invoke([HumanMessage(content=general_context_prompt)])
-    general_context = general_context_response.content
+# Graph nodes, used to report job progress
+ANALYSIS_NODES = ["general_context_agent", "topic_extractor_agent", *SPECIALIST_NODES, "final_summary_agent"]
+
+def build_graph(checkpointer=None):
+    """Build and compile the analysis graph
+    Args:
+        checkpointer: BaseCheckpointSaver - optional, saves the state after every node
+    """
+    flow = StateGraph(DeckAnalysisState)
+
+    # Add nodes, each timed and traced as a "node" span
+    nodes = {
+        "general_context_agent": general_context_agent,
+        "topic_extractor_agent": topic_extractor_agent,
+        "tam_sam_agent": tam_sam_agent,
+        "team_slide_agent": founders_background_agent,
+        "analyse_competition_agent": analyse_competition_agent,
+        "final_summary_agent": final_summary_agent,
+    }
+    for name, node in nodes.items():
+        flow.add_node(name, traced("node", name)(node))
+
+    # Fan out: the deck summary and the slide topics are computed in parallel,
+    # then every specialist agent runs as its own branch once both are ready
+    flow.add_edge(START, "general_context_agent")
+    flow.add_edge(START, "topic_extractor_agent")
+    for node in SPECIALIST_NODES:
+        flow.add_edge(["general_context_agent", "topic_extractor_agent"], node)
+
+    # Fan in: the final summary waits for every specialist branch
+    flow.add_edge(SPECIALIST_NODES, "final_summary_agent")
+    flow.add_edge("final_summary_agent", END)
+
+    return flow.compile(checkpointer=checkpointer)
+
+# Compiled once at import time and shared by every analysis (compiled graphs are safe to reuse concurrently)
+analysis_graph = build_graph()
+
+# Same graph with per-node checkpoints, for analyses that can be resumed by thread id (queued jobs).
+# Interactive analyses use the plain graph and skip the checkpoint writes.
+checkpointer = create_checkpointer(CHECKPOINT_BACKEND, CHECKPOINT_DB_PATH)
+checkpointed_graph = build_graph(checkpointer) if checkpointer is not None else None
+
+@traced("analysis", "run_vc_analysis")
+def run_vc_analysis(
+    page_content: List[Dict[str, Any]],
+    whole_text: str,
+    on_progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+    document_id: str = "",
+    thread_id: Optional[str] = None,
+    on_update: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    on_token: Optional[Callable[[Dict[str, Any]], None]] = None,
+) -> DeckAnalysisState:
+    """Run the multi-agent analysis over an extracted pitch deck
+    Args:
+        page_content: list - pages as returned by extract_info_from_pdf
+        whole_text: str
+        on_progress: callable - optional, called with a progress dict every time a graph node completes.
+            An exception raised by the callback stops the analysis (used to cancel jobs).
+        document_id: str - id of the open PdfSession the agents render slides from
+        thread_id: str - optional, checkpoints the state after every node under this id. If an earlier
+            run with the same id failed or was interrupted, it continues from its last completed nodes
+            (the PdfSession must then be reopened with the same document_id).
+        on_update: callable - optional, called as on_update(node, update) with the state keys each node
+            writes (topics, tam_sam_info, page_feedback...) as soon as it completes. Like on_progress,
+            an exception raised by the callback stops the analysis.
+        on_token: callable - optional, called with every {"type": "token", "agent", "slide", "text"} chunk
+            of the prose outputs streamed by the agents (see CachedChatModel.invoke_streaming)
+    Returns:
+        DeckAnalysisState: The final state of the graph
+    """
     initial_state = {
-        "general_context": general_context,
+        "general_context": "",
         "page_content": page_content,
         "whole_text": whole_text,
-        "page_feedback": [],
+        "document_id": document_id,
+        "page_feedback": {},
         "topics": [],
         "tam_sam_info": "",
         "tam_sam_sources": [],
         "matched_feedback": [],
     }
 
-    flow = StateGraph(DeckAnalysisState)
+    graph = analysis_graph
+    config = None
+    graph_input = initial_state
+    final_state = initial_state
+    completed_nodes = []
 
-    # Add nodes
-    flow.add_node("topic_extractor_agent", topic_extractor_agent)
-    flow.add_node("tam_sam_agent", tam_sam_agent)
-    flow.add_node("team_slide_agent", founders_background_agent)
-    flow.add_node("final_summary_agent", final_summary_agent)
-    # Simple sequential flow
-    flow.add_edge(START, "topic_extractor_agent")
-    flow.add_edge("topic_extractor_agent", "tam_sam_agent")
-    flow.add_edge("tam_sam_agent", "team_slide_agent")
-    flow.add_edge("team_slide_agent", "final_summary_agent")
-    flow.add_edge("final_summary_agent", END)
+    if thread_id and checkpointed_graph is not None:
+        graph = checkpointed_graph
+        config = {"configurable": {"thread_id": thread_id}}
+        snapshot = graph.get_state(config)
+        if snapshot.values and not snapshot.next:
+            # An earlier run already finished
+            return snapshot.values
+        if snapshot.next:
+            # Resume: the graph re-runs only the nodes that did not complete
+            graph_input = None
+            final_state = snapshot.values
+            completed_nodes = completed_checkpoint_nodes(config)
+            print(f"Resuming analysis {thread_id} after {completed_nodes}")
 
-    built_flow = flow.compile()
-    final_state = built_flow.invoke(initial_state)
+    stream_mode = ["updates", "values", "custom"] if on_token is not None else ["updates", "values"]
+    for mode, chunk in graph.stream(graph_input, config, stream_mode=stream_mode):
+        if mode == "values":
+            final_state = chunk
+            continue
+        if mode == "custom":
+            on_token(chunk)
+            continue
+
+        new_nodes = [node for node in chunk if node in ANALYSIS_NODES and node not in completed_nodes]
+        completed_nodes.extend(new_nodes)
+        if on_update is not None:
+            for node in new_nodes:
+                on_update(node, chunk[node] or {})
+        if on_progress is not None:
+            on_progress({
+                "completed_nodes": list(completed_nodes),
+                "total_nodes": len(ANALYSIS_NODES),
+                "last_node": completed_nodes[-1] if completed_nodes else None,
+            })
 
-    png_data = built_flow.get_graph().draw_mermaid_png()
-    with open("agent_graph.png", "wb") as f:
-        f.write(png_data)
-        
     return final_state
 
 
+def completed_checkpoint_nodes(config: Dict[str, Any]) -> List[str]:
+    """Graph nodes whose output is saved in the checkpoints of a thread, in completion order"""
+    completed = []
+    for snapshot in reversed(list(checkpointed_graph.get_state_history(config))):
+        for task in snapshot.tasks:
+            if task.result is not None and task.name in ANALYSIS_NODES and task.name not in completed:
+                completed.append(task.name)
+    return completed
+
+
+def clear_checkpoints(thread_id: str):
+    """Drop the checkpoints of a finished or abandoned analysis"""
+    if checkpointer is not None:
+        checkpointer.delete_thread(thread_id)
+
+
+def export_graph_png(output_path: str = "agent_graph.png") -> str:
+    """Render the analysis graph as a Mermaid PNG (may call the mermaid.ink web service)
+    Args:
+        output_path: str
+    Returns:
+        str: The path the PNG was written to
+    """
+    png_data = analysis_graph.get_graph().draw_mermaid_png()
+    with open(output_path, "wb") as f:
+        f.write(png_data)
+    return output_path
 
 
+if __name__ == "__main__":
+    import argparse
 
+    parser = argparse.ArgumentParser(description="Analysis graph utilities")
+    parser.add_argument("--export-graph", metavar="PATH", nargs="?", const="agent_graph.png",
+                        help="Write the graph diagram as a PNG (default: agent_graph.png)")
+    args = parser.parse_args()
 
+    if args.export_graph:
+        print(f"Graph written to {export_graph_png(args.export_graph)}")
+    else:
+        parser.print_help()
@@ -1,11 +1,19 @@
-from utils.parse_pdf import extract_info_from_pdf
+import sys
+
+from utils.pdf_session import open_session
 from graph_flow import run_vc_analysis
 
 
-page_content, whole_text = extract_info_from_pdf("test_pitch_solea.pdf")
+# Usage: python main.py [path/to/deck.pdf]
+pdf_path = sys.argv[1] if len(sys.argv) > 1 else "test_pitch_solea.pdf"
+
+with open(pdf_path, "rb") as f:
+    pdf_bytes = f.read()
 
-print(page_content)
-print(whole_text)
+with open_session(data=pdf_bytes) as session:
+    page_content, whole_text = session.extract_info()
 
-run_vc_analysis(page_content, whole_text)
+    print(page_content)
+    print(whole_text)
 
+    run_vc_analysis(page_content, whole_text, document_id=session.session_id)
@@ -1,16 +1,21 @@
-from typing import TypedDict, List, Dict, Any
+from typing import TypedDict, List, Dict, Any, Annotated
+
+
+def merge_dicts(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """Reducer that merges the dicts written by parallel branches (right wins on key clashes).
+    Each specialist branch returns only its own slide key, so no branch overwrites another's feedback."""
+    return {**(left or {}), **(right or {})}
 
 
 class DeckAnalysisState(TypedDict):
-    general_context: str # input
+    general_context: str # output of general_context_agent
     page_content: List[Dict[str, Any]] # input (should not be modified by agents)
     whole_text: str # input (should not be modified by agents)
-    page_feedback: List[Dict[str, Any]] # output
+    document_id: str # input, id of the open PdfSession (see utils/pdf_session.py)
+    # output, keyed by slide topic ("market_size_slide", "team_slide", "competitors_slide").
+    # Each specialist branch only writes its own key and the reducer merges them.
+    page_feedback: Annotated[Dict[str, Dict[str, Any]], merge_dicts]
     topics: List[Dict[str, Any]] # output
     tam_sam_info: str # output
     tam_sam_sources: List[str] # output
     matched_feedback: List[Dict[str, Any]] # output
-
-
-
-
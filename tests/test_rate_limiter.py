@@ -0,0 +1,176 @@
+import threading
+import time
+
+import pytest
+
+from utils.rate_limiter import BATCH, INTERACTIVE, ProviderLimiter, TokenBucket
+
+
+class FakeResponse:
+    def __init__(self, status_code: int, headers: dict):
+        self.status_code = status_code
+        self.headers = headers
+
+
+class FakeHTTPError(Exception):
+    """Shaped like the SDKs' status errors: the failed response is on .response"""
+
+    def __init__(self, status_code: int = 429, headers: dict = None):
+        super().__init__(f"{status_code} from the fake provider")
+        self.response = FakeResponse(status_code, headers or {})
+
+
+class FakeProvider:
+    """Raises the scripted errors in turn, then answers every call; records when each call arrived"""
+
+    def __init__(self, errors=()):
+        self.errors = list(errors)
+        self.call_times = []
+        self._lock = threading.Lock()
+
+    def __call__(self, answer="ok"):
+        with self._lock:
+            self.call_times.append(time.monotonic())
+            error = self.errors.pop(0) if self.errors else None
+        if error is not None:
+            raise error
+        return answer
+
+
+def limiter(**kwargs) -> ProviderLimiter:
+    settings = {"max_retries": 3, "base_delay": 0.01, "max_delay": 1.0, **kwargs}
+    return ProviderLimiter("fake", **settings)
+
+
+def test_token_bucket_refills_at_its_rate():
+    bucket = TokenBucket(per_minute=60, capacity=2)  # one unit a second
+    now = bucket._updated
+
+    assert bucket.wait_time(2, now) == 0.0
+    bucket.take(2)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 0.25) == pytest.approx(0.75)
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+    # Never fills past its capacity, and a request bigger than the bucket only waits for a full one
+    assert bucket.wait_time(5, now + 60) == 0.0
+    assert bucket.level == 2
+
+
+def test_requests_are_paced_by_the_bucket():
+    provider = FakeProvider()
+    paced = limiter(requests_per_minute=600)  # one request every 0.1s
+    paced.requests = TokenBucket(600, capacity=1)
+
+    for _ in range(4):
+        paced.call(provider)
+
+    gaps = [later - earlier for earlier, later in zip(provider.call_times, provider.call_times[1:])]
+    assert all(gap >= 0.09 for gap in gaps)
+    assert paced.stats()["calls"] == 4
+
+
+def test_retry_after_is_honoured():
+    provider = FakeProvider([FakeHTTPError(429, {"retry-after": "0.3"})])
+    throttled = limiter()
+
+    assert throttled.call(provider) == "ok"
+
+    first, second = provider.call_times
+    # Retry-After plus up to base_delay of jitter
+    assert 0.3 <= second - first < 0.3 + 0.01 + 0.1
+    stats = throttled.stats()
+    assert stats["retries"] == 1 and stats["throttled"] == 1
+
+
+def test_retry_after_ms_is_capped_at_max_delay():
+    throttled = limiter(max_delay=0.5)
+    delay = throttled._retry_delay(FakeHTTPError(429, {"retry-after-ms": "5000"}), attempt=0)
+    assert 0.5 <= delay <= 0.5 + throttled.base_delay
+
+
+def test_throttling_pauses_other_callers():
+    provider = FakeProvider([FakeHTTPError(429, {"retry-after": "0.3"})])
+    throttled = limiter()
+
+    first = threading.Thread(target=throttled.call, args=(provider,))
+    first.start()
+    while not provider.call_times:
+        time.sleep(0.001)
+    time.sleep(0.05)
+    started = time.monotonic()
+    throttled.call(provider)
+    first.join()
+
+    assert time.monotonic() - started >= 0.2
+
+
+def test_backoff_jitter_stays_within_bounds():
+    backoff = limiter(max_retries=100, base_delay=0.1, max_delay=1.0)
+    for attempt in range(8):
+        ceiling = min(backoff.max_delay, backoff.base_delay * 2 ** attempt)
+        delays = [backoff._retry_delay(FakeHTTPError(503), attempt) for _ in range(50)]
+        assert all(0 <= delay <= ceiling for delay in delays)
+        # Jittered, not a fixed schedule
+        assert len(set(delays)) > 1
+
+
+def test_interactive_calls_go_before_queued_batch_calls():
+    provider = FakeProvider()
+    served = []
+    served_lock = threading.Lock()
+    queued = limiter(requests_per_minute=1200)
+    queued.requests = TokenBucket(1200, capacity=1)  # one request every 0.05s
+
+    def call(name, priority):
+        def send():
+            with served_lock:
+                served.append(name)
+            return provider()
+        queued.call(send, priority=priority)
+
+    def wait_for_waiting(count):
+        while queued.stats()["waiting"] < count:
+            time.sleep(0.001)
+
+    # Hold the provider so every call is queued before any of them goes
+    with queued._cond:
+        queued._paused_until = time.monotonic() + 60
+    threads = [threading.Thread(target=call, args=(f"batch-{index}", BATCH)) for index in range(3)]
+    for thread in threads:
+        thread.start()
+    wait_for_waiting(3)
+    interactive = [threading.Thread(target=call, args=(f"interactive-{index}", INTERACTIVE)) for index in range(2)]
+    for thread in interactive:
+        thread.start()
+    wait_for_waiting(5)
+    with queued._cond:
+        queued._paused_until = 0.0
+        queued._cond.notify_all()
+    for thread in threads + interactive:
+        thread.join()
+
+    assert served == ["interactive-0", "interactive-1", "batch-0", "batch-1", "batch-2"]
+
+
+def test_gives_up_once_retries_are_exhausted():
+    errors = [FakeHTTPError(429) for _ in range(10)]
+    provider = FakeProvider(errors)
+    exhausted = limiter(max_retries=2, base_delay=0.001)
+
+    with pytest.raises(FakeHTTPError) as raised:
+        exhausted.call(provider)
+
+    assert raised.value is errors[2]
+    assert len(provider.call_times) == 3
+    stats = exhausted.stats()
+    assert stats["retries"] == 2 and stats["failures"] == 1
+
+
+def test_non_retryable_errors_are_raised_at_once():
+    provider = FakeProvider([FakeHTTPError(400)])
+    strict = limiter()
+
+    with pytest.raises(FakeHTTPError):
+        strict.call(provider)
+    assert len(provider.call_times) == 1
+    assert strict.stats()["retries"] == 0
@@ -0,0 +1,316 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Optional
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    from utils.config import ANTHROPIC_MODEL, PROMPT_VERSION
+except ImportError:
+    from config import ANTHROPIC_MODEL, PROMPT_VERSION
+
+
+class CacheBackend:
+    """Key/value cache with TTL and size-based eviction.
+
+    Values must be JSON-serializable so every backend can store them. Subclasses
+    implement _get/_set/_delete/_clear/__len__; hit/miss counters live here.
+    """
+
+    def __init__(self, ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        value = self._get(key)
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.time() + ttl if ttl else None
+        self._set(key, value, expires_at)
+
+    def delete(self, key: str):
+        self._delete(key)
+
+    def clear(self):
+        self._clear()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self).__name__,
+                "entries": len(self),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+    def _count_evictions(self, count: int):
+        if count:
+            with self._stats_lock:
+                self.evictions += count
+
+    def _get(self, key: str) -> Optional[Any]:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, expires_at: Optional[float]):
+        raise NotImplementedError
+
+    def _delete(self, key: str):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+
+class MemoryLRUCache(CacheBackend):
+    """In-process LRU cache"""
+
+    def __init__(self, max_entries: int = 256, ttl: Optional[float] = None):
+        super().__init__(ttl=ttl)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+        self._count_evictions(evicted)
+
+    def _delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache(CacheBackend):
+    """On-disk cache in a SQLite file, evicting the least recently used entries.
+    Several caches can share one file through different namespaces."""
+
+    def __init__(self, path: str = "cache.db", namespace: str = "default", max_entries: int = 10000, ttl: Optional[float] = None):
+        super().__init__(ttl=ttl)
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL,
+                    last_access REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, last_access)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _get(self, key):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at < now:
+                conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+                return None
+            conn.execute(
+                "UPDATE cache SET last_access = ? WHERE namespace = ? AND key = ?", (now, self.namespace, key)
+            )
+        return json.loads(value)
+
+    def _set(self, key, value, expires_at):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires_at, now),
+            )
+            # Drop expired entries first, then the least recently used ones above max_entries
+            expired = conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND expires_at IS NOT NULL AND expires_at < ?",
+                (self.namespace, now),
+            ).rowcount
+            overflow = conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                "SELECT key FROM cache WHERE namespace = ? ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.namespace, self.namespace, self.max_entries),
+            ).rowcount
+        self._count_evictions(expired + overflow)
+
+    def _delete(self, key):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+
+    def _clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,))
+
+    def __len__(self):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM cache WHERE namespace = ?", (self.namespace,)).fetchone()[0]
+
+
+class RedisCache(CacheBackend):
+    """Cache in any Redis-compatible server. TTL is handled by Redis; size-based
+    eviction is left to the server's maxmemory policy (e.g. allkeys-lru)."""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", namespace: str = "default", ttl: Optional[float] = None):
+        if redis is None:
+            raise ImportError("The redis package is required for the Redis cache backend: pip install redis")
+        super().__init__(ttl=ttl)
+        self.namespace = namespace
+        self._client = redis.Redis.from_url(url)
+
+    def _full_key(self, key):
+        return f"{self.namespace}:{key}"
+
+    def _get(self, key):
+        value = self._client.get(self._full_key(key))
+        return json.loads(value) if value is not None else None
+
+    def _set(self, key, value, expires_at):
+        ttl = max(int(expires_at - time.time()), 1) if expires_at else None
+        self._client.set(self._full_key(key), json.dumps(value), ex=ttl)
+
+    def _delete(self, key):
+        self._client.delete(self._full_key(key))
+
+    def _clear(self):
+        for key in self._client.scan_iter(match=self._full_key("*")):
+            self._client.delete(key)
+
+    def __len__(self):
+        return sum(1 for _ in self._client.scan_iter(match=self._full_key("*")))
+
+
+class TieredCache(CacheBackend):
+    """Memory LRU in front of a slower backend (usually SQLite). Hits in the slow tier are promoted."""
+
+    def __init__(self, fast: CacheBackend, slow: CacheBackend, ttl: Optional[float] = None):
+        super().__init__(ttl=ttl)
+        self.fast = fast
+        self.slow = slow
+
+    def _get(self, key):
+        value = self.fast.get(key)
+        if value is None:
+            value = self.slow.get(key)
+            if value is not None:
+                self.fast.set(key, value)
+        return value
+
+    def _set(self, key, value, expires_at):
+        ttl = expires_at - time.time() if expires_at else None
+        self.fast.set(key, value, ttl=ttl)
+        self.slow.set(key, value, ttl=ttl)
+
+    def _delete(self, key):
+        self.fast.delete(key)
+        self.slow.delete(key)
+
+    def _clear(self):
+        self.fast.clear()
+        self.slow.clear()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["tiers"] = {"memory": self.fast.stats(), "disk": self.slow.stats()}
+        return stats
+
+    def __len__(self):
+        return len(self.slow)
+
+
+def create_cache(backend: str, namespace: str, max_entries: int = 256, ttl: Optional[float] = None,
+                 path: str = "cache.db", redis_url: str = "redis://localhost:6379/0",
+                 memory_entries: int = 256) -> Optional[CacheBackend]:
+    """Build a cache from configuration
+    Args:
+        backend: str - "memory", "sqlite", "tiered" (memory in front of sqlite), "redis" or "none"
+        namespace: str - keeps caches sharing a SQLite file or Redis server apart
+        memory_entries: int - size of the memory tier when backend is "tiered"
+    Returns:
+        CacheBackend, or None when caching is disabled
+    """
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryLRUCache(max_entries=max_entries, ttl=ttl)
+    if backend == "sqlite":
+        return SQLiteCache(path=path, namespace=namespace, max_entries=max_entries, ttl=ttl)
+    if backend == "tiered":
+        return TieredCache(
+            MemoryLRUCache(max_entries=memory_entries, ttl=ttl),
+            SQLiteCache(path=path, namespace=namespace, max_entries=max_entries, ttl=ttl),
+            ttl=ttl,
+        )
+    if backend == "redis":
+        return RedisCache(url=redis_url, namespace=namespace, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
+
+
+def result_cache_key(pdf_bytes: bytes) -> str:
+    """Content-addressed key of a deck's analysis: the deck bytes plus everything that changes the output"""
+    deck_hash = hashlib.sha256(pdf_bytes).hexdigest()
+    return f"{deck_hash}:{ANTHROPIC_MODEL}:{PROMPT_VERSION}"
@@ -0,0 +1,35 @@
+import sqlite3
+from typing import Optional
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:
+    SqliteSaver = None
+
+
+def create_checkpointer(backend: str, path: str = "checkpoints.db") -> Optional[BaseCheckpointSaver]:
+    """Build the LangGraph checkpointer that stores the analysis state after every node
+    Args:
+        backend: str - "sqlite" (survives restarts), "memory" or "none"
+        path: str - SQLite file, for the sqlite backend
+    Returns:
+        BaseCheckpointSaver or None when checkpointing is disabled
+    """
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return InMemorySaver()
+    if backend == "sqlite":
+        if SqliteSaver is None:
+            raise ImportError("The sqlite checkpoint backend needs langgraph-checkpoint-sqlite: "
+                              "pip install langgraph-checkpoint-sqlite")
+        # One connection shared by every job worker thread, SqliteSaver serializes access with its own lock
+        conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        checkpointer = SqliteSaver(conn)
+        checkpointer.setup()
+        return checkpointer
+    raise ValueError(f"Unknown checkpoint backend: {backend}")
@@ -7,3 +7,86 @@ load_dotenv()
 
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
+
+# Analysis execution settings (used by api.py)
+ANALYSIS_EXECUTOR = os.getenv("ANALYSIS_EXECUTOR", "thread")  # "thread" or "process"
+ANALYSIS_MAX_WORKERS = int(os.getenv("ANALYSIS_MAX_WORKERS", "4"))
+ANALYSIS_QUEUE_SIZE = int(os.getenv("ANALYSIS_QUEUE_SIZE", "4"))  # decks allowed to wait for a worker
+ANALYSIS_TIMEOUT_SECONDS = float(os.getenv("ANALYSIS_TIMEOUT_SECONDS", "600"))
+ANALYSIS_RETRY_AFTER_SECONDS = int(os.getenv("ANALYSIS_RETRY_AFTER_SECONDS", "30"))
+
+# Background job queue settings (used by the /jobs endpoints)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = float(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))  # finished jobs and their checkpoints, 0 keeps them
+JOB_SWEEP_INTERVAL_SECONDS = float(os.getenv("JOB_SWEEP_INTERVAL_SECONDS", "3600"))
+
+# Model and prompt version, part of every cache key so a change invalidates old results
+ANTHROPIC_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
+PROMPT_VERSION = os.getenv("PROMPT_VERSION", "2")
+
+# Shared cache settings
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "cache.db")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+# Whole-deck result cache (used by api.py)
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "sqlite")  # "memory", "sqlite", "redis" or "none"
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "500"))
+
+# Memoized LLM responses shared by all agents (used by utils/llm_gateway.py)
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "tiered")  # "memory", "sqlite", "tiered", "redis" or "none"
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "20000"))
+
+# Tavily search result cache (used by utils/search_client.py)
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "sqlite")  # "memory", "sqlite", "tiered", "redis" or "none"
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "20000"))
+
+# Slide images sent to vision calls (used by utils/image_encoding.py)
+IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "jpeg")  # "jpeg" or "webp" (webp needs Pillow)
+IMAGE_BYTE_BUDGET = int(os.getenv("IMAGE_BYTE_BUDGET", str(1024 * 1024)))  # well under Anthropic's 5MB limit
+IMAGE_MAX_QUALITY = int(os.getenv("IMAGE_MAX_QUALITY", "85"))
+IMAGE_MIN_QUALITY = int(os.getenv("IMAGE_MIN_QUALITY", "40"))
+
+# Connection pool of the Anthropic messages.create client (used by utils/llm_gateway.py)
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "20"))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "10"))
+LLM_KEEPALIVE_SECONDS = float(os.getenv("LLM_KEEPALIVE_SECONDS", "30"))
+
+# Founders or competitors verified at once within one agent (searches plus an LLM call each)
+VERIFICATION_MAX_CONCURRENCY = int(os.getenv("VERIFICATION_MAX_CONCURRENCY", "5"))
+
+# Topic classification (used by agents/topic_extract.py)
+TOPIC_BATCH_TOKEN_BUDGET = int(os.getenv("TOPIC_BATCH_TOKEN_BUDGET", "12000"))  # slide text per batched call, ~4 chars a token
+TOPIC_FALLBACK_MAX_CONCURRENCY = int(os.getenv("TOPIC_FALLBACK_MAX_CONCURRENCY", "8"))  # batched and per-page calls at once
+
+# Tool-use structured outputs (used by utils/structured_output.py)
+STRUCTURED_OUTPUT_REPAIR_ATTEMPTS = int(os.getenv("STRUCTURED_OUTPUT_REPAIR_ATTEMPTS", "1"))  # re-asks after invalid output
+
+# Outbound rate limits and retries (used by utils/rate_limiter.py), 0 disables a limit
+ANTHROPIC_REQUESTS_PER_MINUTE = float(os.getenv("ANTHROPIC_REQUESTS_PER_MINUTE", "50"))
+ANTHROPIC_TOKENS_PER_MINUTE = float(os.getenv("ANTHROPIC_TOKENS_PER_MINUTE", "40000"))
+TAVILY_REQUESTS_PER_MINUTE = float(os.getenv("TAVILY_REQUESTS_PER_MINUTE", "100"))
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "5"))
+RATE_LIMIT_BASE_DELAY_SECONDS = float(os.getenv("RATE_LIMIT_BASE_DELAY_SECONDS", "1"))
+RATE_LIMIT_MAX_DELAY_SECONDS = float(os.getenv("RATE_LIMIT_MAX_DELAY_SECONDS", "60"))
+
+# Per-node checkpoints of queued job analyses, so a failed or interrupted job resumes (used by graph_flow.py)
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "sqlite")  # "sqlite", "memory" or "none"
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", "checkpoints.db")
+
+# Prices used for cost estimates in batch summaries, in USD per million tokens (used by batch.py)
+LLM_INPUT_COST_PER_MTOK = float(os.getenv("LLM_INPUT_COST_PER_MTOK", "3.0"))
+LLM_OUTPUT_COST_PER_MTOK = float(os.getenv("LLM_OUTPUT_COST_PER_MTOK", "15.0"))
+
+# OpenTelemetry span export (used by utils/telemetry.py), /metrics is always on
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "none")  # "otlp", "console" or "none"
+TRACING_SERVICE_NAME = os.getenv("TRACING_SERVICE_NAME", "pitch-deck-analyzer")
+
+# Prompt token budgets, estimated at 4 characters a token, 0 disables a limit (used by utils/prompt_compaction.py)
+PROMPT_BUDGET_DECK_TEXT_TOKENS = int(os.getenv("PROMPT_BUDGET_DECK_TEXT_TOKENS", "12000"))  # deck text in the summary call
+PROMPT_BUDGET_CONTEXT_TOKENS = int(os.getenv("PROMPT_BUDGET_CONTEXT_TOKENS", "400"))  # summary re-sent to every agent
+PROMPT_BUDGET_FINAL_SUMMARY_TOKENS = int(os.getenv("PROMPT_BUDGET_FINAL_SUMMARY_TOKENS", "8000"))  # slide blocks to match
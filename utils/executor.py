@@ -0,0 +1,150 @@
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+
+def map_concurrently(fn, items: list, max_workers: int, return_exceptions: bool = False) -> list:
+    """Call fn on every item from worker threads, at most max_workers at once, for the fan-outs inside an agent
+    Args:
+        fn: callable - takes one item
+        items: list
+        max_workers: int - calls in flight at once, 1 runs them one after the other
+        return_exceptions: bool - return failed calls as their exception instead of raising the first one
+    Returns:
+        list: The results, in the same order as items
+    """
+    if not items:
+        return []
+
+    def run(item):
+        try:
+            return fn(item)
+        except Exception as e:
+            if return_exceptions:
+                return e
+            raise
+
+    # One context copy per call, so the workers keep the caller's call_priority, trace span and stream writer
+    contexts = [contextvars.copy_context() for _ in items]
+    with ThreadPoolExecutor(max_workers=max(min(max_workers, len(items)), 1)) as pool:
+        return list(pool.map(lambda context, item: context.run(run, item), contexts, items))
+
+
+class ExecutorBusyError(Exception):
+    """Raised when every worker is busy and the waiting queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"All analysis workers are busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+class ExecutorClosedError(Exception):
+    """Raised when work is submitted after the executor has been shut down"""
+
+
+class AnalysisExecutor:
+    """Bounded worker pool that runs blocking analyses off the event loop.
+
+    At most `max_workers` analyses run at once and at most `queue_size` more are
+    allowed to wait for a free worker. Anything beyond that is rejected straight
+    away with ExecutorBusyError so the caller can answer with a Retry-After.
+    """
+
+    def __init__(self, max_workers: int = 4, queue_size: int = 4, kind: str = "thread", retry_after: int = 30):
+        if kind == "process":
+            self._pool = ProcessPoolExecutor(max_workers=max_workers)
+        elif kind == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis")
+        else:
+            raise ValueError(f"Unknown executor kind: {kind}")
+
+        self.kind = kind
+        self.max_workers = max_workers
+        self.capacity = max_workers + queue_size
+        self.retry_after = retry_after
+        self._in_flight = 0
+        self._timed_out = 0
+        self._overrunning = 0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """Submit work to the pool, or raise if there is no room for it
+        Args:
+            fn: callable - must be picklable when running in process mode
+        Returns:
+            Future: The future of the submitted work
+        """
+        with self._lock:
+            if self._closed:
+                raise ExecutorClosedError("Analysis executor is shutting down")
+            if self._in_flight >= self.capacity:
+                raise ExecutorBusyError(self.retry_after)
+            self._in_flight += 1
+
+        try:
+            future = self._pool.submit(fn, *args, **kwargs)
+        except Exception:
+            self._release()
+            raise
+
+        # The slot is only freed once the work really finishes, even if the caller timed out
+        future.add_done_callback(lambda _: self._release())
+        return future
+
+    async def run(self, fn, *args, timeout: float = None, on_timeout: Optional[Callable[[], None]] = None, **kwargs):
+        """Run work in the pool and await its result without blocking the event loop
+        Args:
+            fn: callable
+            timeout: float - seconds to wait before raising asyncio.TimeoutError
+            on_timeout: callable - optional, called when the timeout hits work that is already running,
+                to ask it to stop (a pool thread cannot be interrupted from outside)
+        Returns:
+            The return value of fn
+        """
+        future = self.submit(fn, *args, **kwargs)
+        result = asyncio.wrap_future(future)
+        try:
+            # shield so a timeout does not try to cancel a future that is already running
+            return await asyncio.wait_for(asyncio.shield(result), timeout=timeout)
+        except asyncio.TimeoutError:
+            # Nobody awaits the result any more, so its error (usually the stop requested below) is dropped
+            result.add_done_callback(lambda done: done.cancelled() or done.exception())
+            # Work still waiting for a worker is dropped, running work keeps its slot until it stops
+            if not future.cancel():
+                with self._lock:
+                    self._overrunning += 1
+                future.add_done_callback(lambda _: self._overrun_done())
+                if on_timeout is not None:
+                    on_timeout()
+            with self._lock:
+                self._timed_out += 1
+            raise
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "capacity": self.capacity,
+                "in_flight": self._in_flight,
+                "running": min(self._in_flight, self.max_workers),
+                "queued": max(self._in_flight - self.max_workers, 0),
+                "timed_out": self._timed_out,
+                "overrunning": self._overrunning,
+            }
+
+    def shutdown(self, wait: bool = False):
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _overrun_done(self):
+        with self._lock:
+            self._overrunning -= 1
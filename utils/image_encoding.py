@@ -0,0 +1,181 @@
+import threading
+from io import BytesIO
+
+import pymupdf
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from utils.config import IMAGE_BYTE_BUDGET, IMAGE_FORMAT, IMAGE_MAX_QUALITY, IMAGE_MIN_QUALITY
+except ImportError:
+    from config import IMAGE_BYTE_BUDGET, IMAGE_FORMAT, IMAGE_MAX_QUALITY, IMAGE_MIN_QUALITY
+
+# Claude downscales anything with a longer edge above ~1568px, so rendering bigger only costs bytes
+MAX_LONG_EDGE_PX = 1568
+# Sparse slides (a title, a few words) stay readable at a much smaller size
+MIN_LONG_EDGE_PX = 1024
+# Characters per 10,000 pt² at which a slide counts as fully dense
+DENSE_CHARS_PER_AREA = 40.0
+MIN_DPI = 50
+MAX_DPI = 150
+# Padding kept around the content when cropping, in points
+CROP_PADDING = 12
+# Drawings covering more than this share of the page are backgrounds, not content
+BACKGROUND_AREA_RATIO = 0.9
+# Only crop when it removes at least this share of the page
+MIN_CROP_GAIN = 0.1
+
+
+class EncodingStats:
+    """Bytes sent per page for every slide image encoded for a vision call"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def record(self, result: dict):
+        with self._lock:
+            self.pages += 1
+            self.total_bytes += result["bytes"]
+            self.max_bytes = max(self.max_bytes, result["bytes"])
+            self.cropped_pages += int(result["cropped"])
+            self.downscaled_pages += int(result["downscaled"])
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "pages": self.pages,
+                "total_bytes": self.total_bytes,
+                "avg_bytes_per_page": round(self.total_bytes / self.pages) if self.pages else 0,
+                "max_bytes_per_page": self.max_bytes,
+                "cropped_pages": self.cropped_pages,
+                "downscaled_pages": self.downscaled_pages,
+            }
+
+    def reset(self):
+        with self._lock:
+            self.pages = 0
+            self.total_bytes = 0
+            self.max_bytes = 0
+            self.cropped_pages = 0
+            self.downscaled_pages = 0
+
+
+encoding_stats = EncodingStats()
+
+
+def content_bbox(page) -> pymupdf.Rect:
+    """Bounding box of everything painted on the page, ignoring full-page backgrounds"""
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    bbox = pymupdf.Rect()
+    for _, rect in page.get_bboxlog():
+        rect = pymupdf.Rect(rect) & page_rect
+        if rect.is_empty or rect.width * rect.height > BACKGROUND_AREA_RATIO * page_area:
+            continue
+        bbox |= rect
+    return bbox
+
+
+def crop_rect(page) -> tuple[pymupdf.Rect, bool]:
+    """The area of the page worth sending, and whether it is smaller than the page"""
+    page_rect = page.rect
+    bbox = content_bbox(page)
+    if bbox.is_empty:
+        return page_rect, False
+
+    clip = pymupdf.Rect(bbox.x0 - CROP_PADDING, bbox.y0 - CROP_PADDING,
+                        bbox.x1 + CROP_PADDING, bbox.y1 + CROP_PADDING) & page_rect
+    gain = 1 - (clip.width * clip.height) / (page_rect.width * page_rect.height)
+    if gain < MIN_CROP_GAIN:
+        return page_rect, False
+    return clip, True
+
+
+def predict_dpi(page, clip: pymupdf.Rect) -> int:
+    """Pick a resolution from the size of the area to render and how much text it holds.
+    Dense slides get up to MAX_LONG_EDGE_PX on their longer edge, sparse ones down to MIN_LONG_EDGE_PX."""
+    text_chars = len(page.get_text("text", clip=clip).strip())
+    area = max(clip.width * clip.height, 1.0)
+    density = min(text_chars / area * 10000 / DENSE_CHARS_PER_AREA, 1.0)
+
+    target_long_edge = MIN_LONG_EDGE_PX + density * (MAX_LONG_EDGE_PX - MIN_LONG_EDGE_PX)
+    dpi = target_long_edge * 72 / max(clip.width, clip.height, 1.0)
+    return int(max(MIN_DPI, min(MAX_DPI, dpi)))
+
+
+def _encode(pixmap, image_format: str, quality: int) -> bytes:
+    if image_format == "webp":
+        image = Image.frombytes("RGB", (pixmap.width, pixmap.height), pixmap.samples)
+        buffer = BytesIO()
+        image.save(buffer, format="WEBP", quality=quality)
+        return buffer.getvalue()
+    return pixmap.tobytes("jpeg", jpg_quality=quality)
+
+
+def _best_quality(pixmap, image_format: str, byte_budget: int):
+    """Highest quality in [IMAGE_MIN_QUALITY, IMAGE_MAX_QUALITY] that fits the budget (binary search).
+    Returns (quality, data), or (IMAGE_MIN_QUALITY, data) when even the lowest quality is too big."""
+    data = _encode(pixmap, image_format, IMAGE_MAX_QUALITY)
+    if len(data) <= byte_budget:
+        return IMAGE_MAX_QUALITY, data
+
+    low, high = IMAGE_MIN_QUALITY, IMAGE_MAX_QUALITY - 1
+    best = None
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = _encode(pixmap, image_format, quality)
+        if len(candidate) <= byte_budget:
+            best = (quality, candidate)
+            low = quality + 1
+        else:
+            high = quality - 1
+    if best is not None:
+        return best
+    return IMAGE_MIN_QUALITY, _encode(pixmap, image_format, IMAGE_MIN_QUALITY)
+
+
+def encode_page(page, byte_budget: int = IMAGE_BYTE_BUDGET, image_format: str = IMAGE_FORMAT) -> dict:
+    """Render a slide once and encode it as small as possible for a vision call
+    Args:
+        page: pymupdf.Page
+        byte_budget: int - maximum size of the encoded image
+        image_format: str - "jpeg", or "webp" (needs Pillow, falls back to jpeg)
+    Returns:
+        dict: data (bytes), media_type, bytes, dpi, quality, width, height, cropped, downscaled
+    """
+    if image_format == "webp" and Image is None:
+        image_format = "jpeg"
+
+    clip, cropped = crop_rect(page)
+    dpi = predict_dpi(page, clip)
+    pixmap = page.get_pixmap(dpi=dpi, clip=clip, alpha=False)
+
+    quality, data = _best_quality(pixmap, image_format, byte_budget)
+
+    # Still too big at the lowest quality: shrink the pixels we already have instead of re-rendering
+    downscaled = False
+    attempts = 0
+    while len(data) > byte_budget and attempts < 4:
+        scale = max(0.5, (byte_budget / len(data)) ** 0.5 * 0.9)
+        pixmap = pymupdf.Pixmap(pixmap, max(int(pixmap.width * scale), 1), max(int(pixmap.height * scale), 1), None)
+        quality, data = _best_quality(pixmap, image_format, byte_budget)
+        downscaled = True
+        attempts += 1
+
+    result = {
+        "data": data,
+        "media_type": f"image/{image_format}",
+        "bytes": len(data),
+        "dpi": dpi,
+        "quality": quality,
+        "width": pixmap.width,
+        "height": pixmap.height,
+        "cropped": cropped,
+        "downscaled": downscaled,
+    }
+    encoding_stats.record(result)
+    return result
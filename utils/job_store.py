@@ -0,0 +1,274 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# Job lifecycle: queued -> running -> completed | failed | cancelled
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (COMPLETED, FAILED, CANCELLED)
+
+
+class JobCancelledError(Exception):
+    """Raised inside a running job once a cancel has been requested for it"""
+
+
+class JobStore:
+    """Persistent job queue backed by a single SQLite file.
+
+    Stands in for a real queue (Redis, SQS...) when running locally. The uploaded
+    PDF is stored with the job so queued work survives a restart.
+    """
+
+    def __init__(self, db_path: str = "jobs.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    filename TEXT,
+                    pdf BLOB,
+                    progress TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    cancel_requested INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at)")
+
+    @contextmanager
+    def _connect(self, immediate: bool = False):
+        """Open a short-lived connection that commits on success and is always closed.
+        immediate takes the database write lock up front, so a read followed by an update is atomic
+        across processes sharing the file too (the in-process lock only covers this process's threads)."""
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                if immediate:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+        finally:
+            conn.close()
+
+    def create_job(self, filename: str, pdf_bytes: bytes) -> str:
+        """Queue a new job and return its id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, filename, pdf, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, QUEUED, filename, pdf_bytes, now, now),
+            )
+        return job_id
+
+    def claim_next(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it (with its PDF bytes)"""
+        with self._lock, self._connect(immediate=True) as conn:
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE id = ?", (RUNNING, time.time(), row["id"])
+            )
+        job = dict(row)
+        job["status"] = RUNNING
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return the public view of a job (without the PDF bytes), or None if it does not exist"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, status, filename, progress, result, error, cancel_requested, created_at, updated_at "
+                "FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["progress"] = json.loads(job["progress"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        return job
+
+    def update_progress(self, job_id: str, progress: Dict[str, Any]):
+        self._update(job_id, progress=json.dumps(progress))
+
+    def complete(self, job_id: str, result: Dict[str, Any]):
+        # The PDF is no longer needed once the result is stored
+        self._update(job_id, status=COMPLETED, result=json.dumps(result), pdf=None)
+
+    def fail(self, job_id: str, error: str):
+        self._update(job_id, status=FAILED, error=error)
+
+    def mark_cancelled(self, job_id: str):
+        self._update(job_id, status=CANCELLED, pdf=None)
+
+    def request_cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a job. Queued and failed jobs are cancelled at once (a failed job can then no longer
+        be resumed), running jobs stop after their current node.
+        Returns:
+            str: The job status after the request, or None if the job does not exist
+        """
+        with self._lock, self._connect(immediate=True) as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            status = row["status"]
+            if status in (QUEUED, FAILED):
+                conn.execute(
+                    "UPDATE jobs SET status = ?, cancel_requested = 1, pdf = NULL, updated_at = ? WHERE id = ?",
+                    (CANCELLED, time.time(), job_id),
+                )
+                return CANCELLED
+            if status == RUNNING:
+                conn.execute(
+                    "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ?", (time.time(), job_id)
+                )
+            return status
+
+    def is_cancel_requested(self, job_id: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def resume(self, job_id: str) -> Optional[str]:
+        """Put a failed job back in the queue. Its analysis continues from its last checkpoint.
+        Returns:
+            str: The job status after the request, or None if the job does not exist
+        """
+        with self._lock, self._connect(immediate=True) as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            if row["status"] != FAILED:
+                return row["status"]
+            conn.execute(
+                "UPDATE jobs SET status = ?, error = NULL, updated_at = ? WHERE id = ?", (QUEUED, time.time(), job_id)
+            )
+            return QUEUED
+
+    def purge_finished(self, older_than: float) -> List[str]:
+        """Delete jobs that finished (completed, failed or cancelled) more than older_than seconds ago
+        Returns:
+            list: The ids of the deleted jobs
+        """
+        placeholders = ", ".join("?" for _ in FINISHED_STATUSES)
+        with self._lock, self._connect() as conn:
+            rows = conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ? RETURNING id",
+                (*FINISHED_STATUSES, time.time() - older_than),
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def requeue_running(self) -> int:
+        """Put jobs left running by a crashed or restarted process back in the queue"""
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?", (QUEUED, time.time(), RUNNING)
+            )
+            return cursor.rowcount
+
+    def _update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+
+class JobWorker:
+    """Background threads that pull jobs from a JobStore and run them through a handler.
+
+    The handler is called as handler(job, report_progress) and returns the JSON-serializable
+    result. report_progress(progress) stores the progress dict and raises JobCancelledError
+    when the job has been cancelled, so cancellation takes effect between graph nodes.
+
+    With retention_seconds set, one more thread deletes finished jobs older than that every
+    sweep_interval seconds and calls on_purge(job_id) for each, to drop what is kept beside them.
+    """
+
+    def __init__(self, store: JobStore, handler: Callable, num_workers: int = 2, poll_interval: float = 1.0,
+                 retention_seconds: float = 0, sweep_interval: float = 3600,
+                 on_purge: Optional[Callable[[str], None]] = None):
+        self.store = store
+        self.handler = handler
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.retention_seconds = retention_seconds
+        self.sweep_interval = sweep_interval
+        self.on_purge = on_purge
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        requeued = self.store.requeue_running()
+        if requeued:
+            print(f"Requeued {requeued} interrupted job(s)")
+        for index in range(self.num_workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        if self.retention_seconds > 0:
+            thread = threading.Thread(target=self._sweep, name="job-sweeper", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            job = self.store.claim_next()
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._process(job)
+
+    def _sweep(self):
+        while not self._stop.is_set():
+            try:
+                purged = self.store.purge_finished(self.retention_seconds)
+                for job_id in purged:
+                    if self.on_purge is not None:
+                        self.on_purge(job_id)
+                if purged:
+                    print(f"Purged {len(purged)} finished job(s)")
+            except Exception as e:
+                print(f"Job sweep failed: {e}")
+            self._stop.wait(self.sweep_interval)
+
+    def _process(self, job: Dict[str, Any]):
+        job_id = job["id"]
+
+        def report_progress(progress: Dict[str, Any]):
+            self.store.update_progress(job_id, progress)
+            if self.store.is_cancel_requested(job_id):
+                raise JobCancelledError(job_id)
+
+        try:
+            if self.store.is_cancel_requested(job_id):
+                raise JobCancelledError(job_id)
+            result = self.handler(job, report_progress)
+            self.store.complete(job_id, result)
+        except JobCancelledError:
+            print(f"Job {job_id} cancelled")
+            self.store.mark_cancelled(job_id)
+        except Exception as e:
+            print(f"Job {job_id} failed: {e}")
+            self.store.fail(job_id, str(e))
@@ -1,69 +1,32 @@
-from anthropic import Anthropic
 import base64
-import pymupdf
 
 try:
-    from utils.config import ANTHROPIC_API_KEY
+    from utils.config import ANTHROPIC_MODEL
+    from utils.llm_gateway import create_message
+    from utils.pdf_session import PdfSession
+    from utils.structured_output import create_structured_message
 except ImportError:
-    from config import ANTHROPIC_API_KEY
+    from config import ANTHROPIC_MODEL
+    from llm_gateway import create_message
+    from pdf_session import PdfSession
+    from structured_output import create_structured_message
 
-client = Anthropic(api_key=ANTHROPIC_API_KEY)
 
-def generate_text(prompt):
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20240620",
-        max_tokens=4000,
-        messages=[{"role": "user", "content": prompt}]
-    )
-    return response.content[0].textP
+def _text_request(prompt: str) -> dict:
+    return {
+        "model": ANTHROPIC_MODEL,
+        "max_tokens": 4000,
+        "temperature": 0,
+        "messages": [{"role": "user", "content": prompt}]
+    }
 
-def query_pdf_page(pdf_page_number: int, prompt: str, pdf_path: str):
-    """Query Claude with a specific page from a PDF document
-    Args:
-        pdf_page_number: int
-        prompt: str
-        pdf_path: str
-    Returns:
-        str: The response from Claude
-    """
-    # Open the PDF and get the specific page
-    pdf_document = pymupdf.open(pdf_path)
-    page = pdf_document[pdf_page_number]
-    
-    # Start with lower DPI to avoid 5MB limit
-    dpi = 100
-    max_size_bytes = 5 * 1024 * 1024  # 5MB limit
-    
-    while dpi >= 50:  # Don't go below 50 DPI for readability
-        # Convert the page to an image (pixmap)
-        pixmap = page.get_pixmap(dpi=dpi)
-        
-        # Convert to JPEG for better compression (instead of PNG)
-        image_data = pixmap.tobytes("jpeg", jpg_quality=85)
-        
-        # Check if image is under 5MB limit
-        if len(image_data) <= max_size_bytes:
-            break
-            
-        # Reduce DPI and try again
-        dpi -= 10
-        pixmap = None  # Free memory
-    
-    if dpi < 50:
-        # Fallback: use very low DPI if still too large
-        pixmap = page.get_pixmap(dpi=50)
-        image_data = pixmap.tobytes("jpeg", jpg_quality=70)
-    
-    # Encode as base64
-    image_base64 = base64.b64encode(image_data).decode('utf-8')
-    
-    # Close the PDF document
-    pdf_document.close()
-    
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20240620",
-        max_tokens=4000,
-        messages=[{
+
+def _image_request(prompt: str, image_base64: str, media_type: str) -> dict:
+    return {
+        "model": ANTHROPIC_MODEL,
+        "max_tokens": 4000,
+        "temperature": 0,
+        "messages": [{
             "role": "user",
             "content": [
                 {
@@ -74,22 +37,37 @@ def query_pdf_page(pdf_page_number: int, prompt: str, pdf_path: str):
                     "type": "image",
                     "source": {
                         "type": "base64",
-                        "media_type": "image/jpeg",
+                        "media_type": media_type,
                         "data": image_base64
                     }
                 }
             ]
         }]
-    )
-    return response.content[0].text
+    }
 
 
-def query_image(prompt: str, image_path: str):
-    """Query Claude with a regular image file (PNG, JPEG, etc.)"""
+def _encode_pdf_page(pdf_page_number: int, document) -> tuple[str, str]:
+    """Base64 image and media type of a PDF page, from a PdfSession or a path"""
+    if isinstance(document, PdfSession):
+        # Encoded once per session, later calls for the same page reuse the image
+        image = document.render_image(pdf_page_number)
+    else:
+        session = PdfSession(pdf_path=document)
+        try:
+            image = session.render_image(pdf_page_number)
+        finally:
+            session.close()
+
+    # Encode as base64
+    return base64.b64encode(image["data"]).decode('utf-8'), image["media_type"]
+
+
+def _encode_image_file(image_path: str) -> tuple[str, str]:
+    """Base64 content and media type of an image file"""
     with open(image_path, "rb") as image_file:
         image_data = image_file.read()
         image_base64 = base64.b64encode(image_data).decode('utf-8')
-    
+
     # Determine media type based on file extension
     if image_path.lower().endswith('.png'):
         media_type = "image/png"
@@ -101,31 +79,52 @@ def query_image(prompt: str, image_path: str):
         media_type = "image/webp"
     else:
         media_type = "image/png"  # Default fallback
-    
-    response = client.messages.create(
-        model="claude-3-5-sonnet-20240620",
-        max_tokens=4000,
-        messages=[{
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": prompt
-                },
-                {
-                    "type": "image", 
-                    "source": {
-                        "type": "base64",
-                        "media_type": media_type,
-                        "data": image_base64
-                    }
-                }
-            ]
-        }]
-    )
+
+    return image_base64, media_type
+
+
+def generate_text(prompt, agent_name: str = "default"):
+    response = create_message(agent_name, **_text_request(prompt))
+    return response.content[0].text
+
+
+def query_pdf_page(pdf_page_number: int, prompt: str, document, agent_name: str = "default"):
+    """Query Claude with a specific page from a PDF document
+    Args:
+        pdf_page_number: int - 0-based page index
+        prompt: str
+        document: PdfSession, or a path to a PDF file (opened just for this call)
+        agent_name: str - the agent the token usage is recorded under
+    Returns:
+        str: The response from Claude
+    """
+    image_base64, media_type = _encode_pdf_page(pdf_page_number, document)
+    response = create_message(agent_name, **_image_request(prompt, image_base64, media_type))
+    return response.content[0].text
+
+
+def query_pdf_page_structured(pdf_page_number: int, prompt: str, document, schema, agent_name: str = "default"):
+    """query_pdf_page answering with an instance of a pydantic schema, through a forced tool call
+    Args:
+        pdf_page_number: int - 0-based page index
+        prompt: str
+        document: PdfSession, or a path to a PDF file (opened just for this call)
+        schema: pydantic model of the expected output (see utils/structured_output.py)
+        agent_name: str - the agent the token usage is recorded under
+    Returns:
+        The validated schema instance, or None if Claude's output stayed invalid after the repair attempts
+    """
+    image_base64, media_type = _encode_pdf_page(pdf_page_number, document)
+    return create_structured_message(agent_name, schema, **_image_request(prompt, image_base64, media_type))
+
+
+def query_image(prompt: str, image_path: str, agent_name: str = "default"):
+    """Query Claude with a regular image file (PNG, JPEG, etc.)"""
+    image_base64, media_type = _encode_image_file(image_path)
+    response = create_message(agent_name, **_image_request(prompt, image_base64, media_type))
     return response.content[0].text
 
 
 if __name__ == "__main__":
     print(query_pdf_page(1, "What is the main idea of the pitch?", "test_pitch_solea.pdf"))
-#     print(generate_text("test"))
\ No newline at end of file
+#     print(generate_text("test"))
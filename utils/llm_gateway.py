@@ -0,0 +1,368 @@
+import functools
+import hashlib
+import json
+import threading
+import time
+from typing import Any, Dict, List
+
+import anthropic
+import httpx
+from anthropic import Anthropic, DefaultHttpxClient
+from anthropic.types import Message
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+from langgraph.config import get_stream_writer
+
+try:
+    from utils.cache import create_cache
+    from utils.config import (
+        ANTHROPIC_API_KEY,
+        ANTHROPIC_MODEL,
+        ANTHROPIC_REQUESTS_PER_MINUTE,
+        ANTHROPIC_TOKENS_PER_MINUTE,
+        CACHE_DB_PATH,
+        LLM_CACHE_BACKEND,
+        LLM_CACHE_MAX_ENTRIES,
+        LLM_CACHE_MEMORY_ENTRIES,
+        LLM_CACHE_TTL_SECONDS,
+        LLM_KEEPALIVE_SECONDS,
+        LLM_MAX_CONNECTIONS,
+        LLM_MAX_KEEPALIVE_CONNECTIONS,
+        REDIS_URL,
+    )
+    from utils.executor import map_concurrently
+    from utils.rate_limiter import scheduler
+    from utils.telemetry import bytes_sent, cache_requests, llm_first_token_seconds, llm_tokens, span
+except ImportError:
+    from cache import create_cache
+    from config import (
+        ANTHROPIC_API_KEY,
+        ANTHROPIC_MODEL,
+        ANTHROPIC_REQUESTS_PER_MINUTE,
+        ANTHROPIC_TOKENS_PER_MINUTE,
+        CACHE_DB_PATH,
+        LLM_CACHE_BACKEND,
+        LLM_CACHE_MAX_ENTRIES,
+        LLM_CACHE_MEMORY_ENTRIES,
+        LLM_CACHE_TTL_SECONDS,
+        LLM_KEEPALIVE_SECONDS,
+        LLM_MAX_CONNECTIONS,
+        LLM_MAX_KEEPALIVE_CONNECTIONS,
+        REDIS_URL,
+    )
+    from executor import map_concurrently
+    from rate_limiter import scheduler
+    from telemetry import bytes_sent, cache_requests, llm_first_token_seconds, llm_tokens, span
+
+
+class UsageTracker:
+    """Per-agent token and latency accounting for every LLM call going through the gateway"""
+
+    def __init__(self):
+        self._usage = {}
+        self._lock = threading.Lock()
+
+    def record(self, agent_name: str, input_tokens: int = 0, output_tokens: int = 0,
+               latency_seconds: float = 0.0, cached: bool = False, first_token_seconds: float = None):
+        with self._lock:
+            usage = self._usage.setdefault(agent_name, {
+                "calls": 0,
+                "cache_hits": 0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+                "latency_seconds": 0.0,
+                "streamed_calls": 0,
+                "first_token_seconds": 0.0,
+            })
+            usage["calls"] += 1
+            usage["cache_hits"] += int(cached)
+            usage["input_tokens"] += input_tokens
+            usage["output_tokens"] += output_tokens
+            usage["latency_seconds"] += latency_seconds
+            if first_token_seconds is not None:
+                usage["streamed_calls"] += 1
+                usage["first_token_seconds"] += first_token_seconds
+
+        cache_requests.inc(cache="llm", result="hit" if cached else "miss")
+        llm_tokens.inc(input_tokens, agent=agent_name, direction="input")
+        llm_tokens.inc(output_tokens, agent=agent_name, direction="output")
+        if first_token_seconds is not None:
+            llm_first_token_seconds.observe(first_token_seconds, agent=agent_name)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """Usage per agent plus a "total" entry"""
+        with self._lock:
+            report = {agent: dict(usage) for agent, usage in self._usage.items()}
+        total = {"calls": 0, "cache_hits": 0, "input_tokens": 0, "output_tokens": 0, "latency_seconds": 0.0,
+                 "streamed_calls": 0, "first_token_seconds": 0.0}
+        for usage in report.values():
+            for key in total:
+                total[key] += usage[key]
+        for usage in [*report.values(), total]:
+            usage["latency_seconds"] = round(usage["latency_seconds"], 3)
+            usage["avg_first_token_seconds"] = (
+                round(usage["first_token_seconds"] / usage["streamed_calls"], 3) if usage["streamed_calls"] else None
+            )
+            usage["first_token_seconds"] = round(usage["first_token_seconds"], 3)
+        report["total"] = total
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._usage = {}
+
+
+usage = UsageTracker()
+
+# Responses are memoized by prompt hash: with temperature 0 the same prompt gives the same answer,
+# so retries and re-runs only pay for prompts that changed
+response_cache = create_cache(
+    LLM_CACHE_BACKEND,
+    namespace="llm_responses",
+    max_entries=LLM_CACHE_MAX_ENTRIES,
+    ttl=LLM_CACHE_TTL_SECONDS,
+    path=CACHE_DB_PATH,
+    redis_url=REDIS_URL,
+    memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+)
+
+# Connection pool of the messages.create client, sized for the parallel graph branches and batch helpers
+http_limits = httpx.Limits(
+    max_connections=LLM_MAX_CONNECTIONS,
+    max_keepalive_connections=LLM_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=LLM_KEEPALIVE_SECONDS,
+)
+
+# Every Anthropic call waits for the shared rate limits and is retried there, so the SDK's own retries are off
+anthropic_limiter = scheduler.register(
+    "anthropic",
+    requests_per_minute=ANTHROPIC_REQUESTS_PER_MINUTE,
+    tokens_per_minute=ANTHROPIC_TOKENS_PER_MINUTE,
+    retry_on=(anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError),
+)
+
+# One client of each kind for the whole process. ChatAnthropic takes no http_client and builds its own pool
+# with httpx defaults, shared by every agent's chat calls; only create_message uses the pool above.
+anthropic_client = Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0,
+                             http_client=DefaultHttpxClient(limits=http_limits))
+chat_model = ChatAnthropic(model=ANTHROPIC_MODEL, temperature=0, max_retries=0)
+
+def message_text(message: BaseMessage) -> str:
+    """Plain text of a message or chunk, whether its content is a string or a list of blocks"""
+    text = message.text
+    return text if isinstance(text, str) else text()
+
+
+def token_writer():
+    """Writer for the "custom" stream of the LangGraph run we are in (a no-op outside of one)"""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+
+def prompt_hash(payload: Any) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+# Rough token costs used to charge the rate limiter before a call; the real usage is settled afterwards
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 1600
+
+
+def estimate_tokens(messages: list) -> int:
+    """Approximate input tokens of LangChain messages or messages.create message dicts"""
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message.content if isinstance(message, BaseMessage) else message.get("content")
+        for block in [content] if isinstance(content, str) else content or []:
+            if isinstance(block, str):
+                chars += len(block)
+            elif block.get("type") in ("image", "image_url"):
+                images += 1
+            else:
+                chars += len(block.get("text", ""))
+    return chars // CHARS_PER_TOKEN + images * TOKENS_PER_IMAGE
+
+
+def request_bytes(messages: list) -> int:
+    """Approximate payload size of LangChain messages or messages.create message dicts: text plus image data"""
+    size = 0
+    for message in messages:
+        content = message.content if isinstance(message, BaseMessage) else message.get("content")
+        for block in [content] if isinstance(content, str) else content or []:
+            if isinstance(block, str):
+                size += len(block)
+            elif block.get("type") == "image":
+                size += len(block.get("source", {}).get("data", ""))
+            elif block.get("type") == "image_url":
+                size += len(block.get("image_url", {}).get("url", ""))
+            else:
+                size += len(block.get("text", ""))
+    return size
+
+
+def chat_token_usage(response: AIMessage) -> dict:
+    """Token usage of a ChatAnthropic response"""
+    token_usage = response.usage_metadata or {}
+    return {"input_tokens": token_usage.get("input_tokens", 0), "output_tokens": token_usage.get("output_tokens", 0)}
+
+
+def message_token_usage(response: Message) -> dict:
+    """Token usage of a messages.create response"""
+    return {"input_tokens": response.usage.input_tokens, "output_tokens": response.usage.output_tokens}
+
+
+def rate_limited_tokens(token_usage: dict) -> int:
+    """Tokens that count against the tokens-per-minute limit"""
+    return token_usage["input_tokens"] + token_usage["output_tokens"]
+
+
+class CachedChatModel:
+    """Stand-in for ChatAnthropic in the agents: same invoke/batch calls, but memoized,
+    sharing one underlying client and recording usage under the agent's name."""
+
+    def __init__(self, agent_name: str, model: ChatAnthropic = None):
+        self.agent_name = agent_name
+        self._model = model
+
+    @property
+    def model(self):
+        # Resolved on every call so the shared chat_model can be swapped (e.g. for a fake in benchmarks)
+        return self._model or chat_model
+
+    def _cache_key(self, messages: List[BaseMessage], kwargs: dict) -> str:
+        return prompt_hash({
+            "model": getattr(self.model, "model", ANTHROPIC_MODEL),
+            "temperature": getattr(self.model, "temperature", 0),
+            "messages": [(message.type, message.content) for message in messages],
+            "kwargs": kwargs,
+        })
+
+    def invoke(self, messages: List[BaseMessage], **kwargs) -> AIMessage:
+        key = self._cache_key(messages, kwargs)
+        if response_cache is not None:
+            cached = response_cache.get(key)
+            if cached is not None:
+                usage.record(self.agent_name, cached=True)
+                return messages_from_dict([cached])[0]
+
+        estimated_tokens = estimate_tokens(messages)
+        bytes_sent.inc(request_bytes(messages), destination="anthropic")
+        start = time.perf_counter()
+        with span("llm", self.agent_name):
+            response = anthropic_limiter.call(
+                functools.partial(self.model.invoke, messages, **kwargs), tokens=estimated_tokens
+            )
+        token_usage = chat_token_usage(response)
+        anthropic_limiter.record_tokens(estimated_tokens, rate_limited_tokens(token_usage))
+        usage.record(self.agent_name, latency_seconds=time.perf_counter() - start, **token_usage)
+
+        if response_cache is not None:
+            response_cache.set(key, message_to_dict(response))
+        return response
+
+    def invoke_streaming(self, messages: List[BaseMessage], slide: str = None, **kwargs) -> AIMessage:
+        """Like invoke, but the text is streamed token by token as it is generated.
+
+        Each text delta is written to the "custom" stream of the running graph as
+        {"type": "token", "agent", "slide", "text"}, so clients can show prose outputs while they
+        are written. If a failed attempt is retried after some tokens went out, a
+        {"type": "token_reset", ...} chunk tells clients to discard them. Cached answers are
+        sent as a single chunk. The first-token latency is recorded in the usage report.
+        Returns:
+            AIMessage: The complete response, as invoke would return it
+        """
+        write = token_writer()
+        tag = {"agent": self.agent_name, "slide": slide}
+
+        key = self._cache_key(messages, kwargs)
+        if response_cache is not None:
+            cached = response_cache.get(key)
+            if cached is not None:
+                usage.record(self.agent_name, cached=True)
+                response = messages_from_dict([cached])[0]
+                write({"type": "token", **tag, "text": response.content})
+                return response
+
+        estimated_tokens = estimate_tokens(messages)
+        bytes_sent.inc(request_bytes(messages), destination="anthropic")
+        start = time.perf_counter()
+        attempt = {"emitted": False, "first_token_seconds": None}
+
+        def run():
+            if attempt["emitted"]:
+                write({"type": "token_reset", **tag})
+                attempt["emitted"] = False
+            response = None
+            for chunk in self.model.stream(messages, **kwargs):
+                response = chunk if response is None else response + chunk
+                text = message_text(chunk)
+                if text:
+                    if attempt["first_token_seconds"] is None:
+                        attempt["first_token_seconds"] = time.perf_counter() - start
+                    attempt["emitted"] = True
+                    write({"type": "token", **tag, "text": text})
+            return response
+
+        with span("llm", self.agent_name, streaming=True):
+            chunk = anthropic_limiter.call(run, tokens=estimated_tokens)
+        response = AIMessage(
+            content=message_text(chunk),
+            response_metadata=chunk.response_metadata,
+            usage_metadata=chunk.usage_metadata,
+        )
+        token_usage = chat_token_usage(response)
+        anthropic_limiter.record_tokens(estimated_tokens, rate_limited_tokens(token_usage))
+        usage.record(
+            self.agent_name,
+            latency_seconds=time.perf_counter() - start,
+            first_token_seconds=attempt["first_token_seconds"],
+            **token_usage,
+        )
+
+        if response_cache is not None:
+            response_cache.set(key, message_to_dict(response))
+        return response
+
+    def batch(self, inputs: List[List[BaseMessage]], config: dict = None, return_exceptions: bool = False) -> list:
+        """Invoke several prompts concurrently, returning responses in input order"""
+        max_concurrency = (config or {}).get("max_concurrency") or len(inputs)
+        return map_concurrently(self.invoke, inputs, max_concurrency, return_exceptions=return_exceptions)
+
+
+def get_chat_model(agent_name: str) -> CachedChatModel:
+    """Chat model for an agent, backed by the shared ChatAnthropic client"""
+    return CachedChatModel(agent_name)
+
+
+def create_message(agent_name: str, **request) -> Message:
+    """Memoized and accounted anthropic_client.messages.create
+    Args:
+        agent_name: str - the agent the usage is recorded under
+        **request: the arguments for messages.create
+    Returns:
+        Message: The Anthropic response
+    """
+    key = prompt_hash({"messages.create": request})
+    if response_cache is not None:
+        cached = response_cache.get(key)
+        if cached is not None:
+            usage.record(agent_name, cached=True)
+            return Message.model_validate(cached)
+
+    estimated_tokens = estimate_tokens(request.get("messages", []))
+    bytes_sent.inc(request_bytes(request.get("messages", [])), destination="anthropic")
+    start = time.perf_counter()
+    with span("llm", agent_name):
+        response = anthropic_limiter.call(
+            functools.partial(anthropic_client.messages.create, **request), tokens=estimated_tokens
+        )
+    token_usage = message_token_usage(response)
+    anthropic_limiter.record_tokens(estimated_tokens, rate_limited_tokens(token_usage))
+    usage.record(agent_name, latency_seconds=time.perf_counter() - start, **token_usage)
+
+    if response_cache is not None:
+        response_cache.set(key, response.model_dump(mode="json"))
+    return response
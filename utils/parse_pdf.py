@@ -13,7 +13,19 @@ def extract_info_from_pdf(pdf_path: str) -> tuple[list, str]:
 
     # pdf_document = pymupdf.open(pdf_url)
     pdf_document = pymupdf.open(pdf_path)
+    try:
+        return extract_info_from_document(pdf_document)
+    finally:
+        pdf_document.close()
 
+
+def extract_info_from_document(pdf_document) -> tuple[list, str]:
+    """Extract text and coordinate information from an already opened PDF
+    Args:
+        pdf_document: pymupdf.Document
+    Returns:
+        tuple: A tuple containing a list of page information and the whole text of the PDF
+    """
     page_list = []
 
     # Only process certain pages
@@ -44,11 +56,10 @@ def extract_page_content(page) -> dict:
     page_rect = page.rect
     page_width = page_rect.width
     page_height = page_rect.height
-    print("##########")
-    print(page_width, page_height)
-    print("##########")
 
-    text_blocks = page.get_text("blocks")
+    # Parse the page once and derive both the blocks and the plain text from the same text page
+    textpage = page.get_textpage()
+    text_blocks = page.get_text("blocks", textpage=textpage)
     text_with_coords = []
 
     for block in text_blocks:
@@ -65,7 +76,7 @@ def extract_page_content(page) -> dict:
         })
 
     return {
-        'text': page.get_text(),
+        'text': page.get_text("text", textpage=textpage),
         'text_with_coordinates': text_with_coords,
         'page_number': page.number,
     }
@@ -0,0 +1,121 @@
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import pymupdf
+
+try:
+    from utils.image_encoding import encode_page
+    from utils.parse_pdf import extract_info_from_document
+    from utils.telemetry import span
+except ImportError:
+    from image_encoding import encode_page
+    from parse_pdf import extract_info_from_document
+    from telemetry import span
+
+
+class PdfSession:
+    """A PDF opened once for a whole analysis.
+
+    Parsed pages and encoded slide images are kept for the lifetime of the session (images in a
+    bounded LRU), so agents asking for the same slide do not re-open or re-rasterize it.
+    PyMuPDF documents are not thread-safe, so all access to the document goes through a lock.
+    """
+
+    def __init__(self, pdf_path: str = None, data: bytes = None, max_cached_images: int = 16, session_id: str = None):
+        if data is not None:
+            self.document = pymupdf.open(stream=data, filetype="pdf")
+        elif pdf_path is not None:
+            self.document = pymupdf.open(pdf_path)
+        else:
+            raise ValueError("PdfSession needs a pdf_path or data")
+
+        self.session_id = session_id or uuid.uuid4().hex
+        self.max_cached_images = max_cached_images
+        self._lock = threading.RLock()
+        self._extracted = None
+        self._images = OrderedDict()  # page_number -> encoded image
+
+    @property
+    def page_count(self) -> int:
+        return self.document.page_count
+
+    def extract_info(self) -> tuple[list, str]:
+        """Parsed pages and whole text, as returned by extract_info_from_pdf (computed once)"""
+        with self._lock:
+            if self._extracted is None:
+                with span("pdf_extract", "extract_info", pages=self.page_count):
+                    self._extracted = extract_info_from_document(self.document)
+            return self._extracted
+
+    def render_image(self, page_number: int) -> dict:
+        """Encode a page for a vision call, reusing an earlier encoding of the same page
+        Args:
+            page_number: int - 0-based page index
+        Returns:
+            dict: The encoded image, see utils.image_encoding.encode_page
+        """
+        with self._lock:
+            if page_number in self._images:
+                self._images.move_to_end(page_number)
+                return self._images[page_number]
+
+            with span("pdf_render", "encode_page", page_number=page_number):
+                image = encode_page(self.document[page_number])
+
+            self._images[page_number] = image
+            while len(self._images) > self.max_cached_images:
+                self._images.popitem(last=False)
+            return image
+
+    def close(self):
+        with self._lock:
+            self._images.clear()
+            if not self.document.is_closed:
+                self.document.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        close_session(self.session_id)
+        self.close()
+
+
+# Open sessions by id. The graph state only carries the id, which keeps it serializable.
+_sessions: Dict[str, PdfSession] = {}
+_sessions_lock = threading.Lock()
+
+
+def open_session(pdf_path: str = None, data: bytes = None, session_id: str = None) -> PdfSession:
+    """Open a PDF and register it so graph nodes can look it up by session id.
+    Pass a session_id that is stable across runs (e.g. a job id) when the analysis may be resumed
+    from a checkpoint, since the checkpointed state refers to the session by id."""
+    session = PdfSession(pdf_path=pdf_path, data=data, session_id=session_id)
+    with _sessions_lock:
+        if session.session_id in _sessions:
+            session.close()
+            raise ValueError(f"A PDF session with id {session.session_id!r} is already open")
+        _sessions[session.session_id] = session
+    return session
+
+
+def get_session(session_id: str) -> Optional[PdfSession]:
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+
+def require_session(session_id: str) -> PdfSession:
+    """Like get_session, but raise if the analysis has no open PDF"""
+    session = get_session(session_id)
+    if session is None:
+        raise ValueError(f"No open PDF session with id {session_id!r}")
+    return session
+
+
+def close_session(session_id: str):
+    with _sessions_lock:
+        session = _sessions.pop(session_id, None)
+    if session is not None:
+        session.close()
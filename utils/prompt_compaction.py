@@ -0,0 +1,255 @@
+import json
+import re
+import threading
+from collections import Counter as CountOf
+from typing import Any, Dict, List, Tuple
+
+try:
+    from utils.config import PROMPT_BUDGET_CONTEXT_TOKENS
+    from utils.llm_gateway import CHARS_PER_TOKEN
+    from utils.telemetry import registry
+except ImportError:
+    from config import PROMPT_BUDGET_CONTEXT_TOKENS
+    from llm_gateway import CHARS_PER_TOKEN
+    from telemetry import registry
+
+# A line is boilerplate (header, footer, company name, "Confidential") when it shows up on at least
+# this many pages, and on at least this share of the deck. Only its first occurrence is kept.
+BOILERPLATE_MIN_PAGES = 3
+BOILERPLATE_MIN_SHARE = 0.4
+
+TRUNCATION_MARKER = " [...]"
+
+_PAGE_NUMBER_LINE = re.compile(r"^(page|slide|p\.?)?\s*\d{1,3}(\s*(/|of)\s*\d{1,3})?$", re.IGNORECASE)
+_SPACES = re.compile(r"[ \t\u00a0]+")
+
+prompt_tokens_saved = registry.counter(
+    "pitchdeck_prompt_tokens_saved_total", "Estimated input tokens removed by prompt compaction", ("agent",))
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count, the same estimate the rate limiter is charged with"""
+    return len(text) // CHARS_PER_TOKEN
+
+
+def compact_json(obj: Any) -> str:
+    """JSON without indentation or spaces after separators (pretty-printing roughly doubles the tokens)"""
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _normalize_line(line: str) -> str:
+    # Exact text only: ignoring digits would also merge real content such as "Revenue 2023" and "Revenue 2024"
+    return _SPACES.sub(" ", line).strip().lower()
+
+
+def _page_lines(text: str) -> List[str]:
+    return [line for line in (_SPACES.sub(" ", line).strip() for line in text.splitlines()) if line]
+
+
+def clean_lines(text: str, repeated_numbers: frozenset = frozenset()) -> List[str]:
+    """Non-empty lines of a page, whitespace collapsed, page numbers and repeated lines removed.
+
+    A line that looks like a page number ("7", "Page 7", "7 / 12") is only dropped when it is the
+    first or last line of the page, or in repeated_numbers: a bare number elsewhere is more likely
+    a metric callout ("150 customers" split over two lines).
+    """
+    lines = _page_lines(text)
+    result = []
+    seen = set()
+    for index, line in enumerate(lines):
+        key = line.lower()
+        if _PAGE_NUMBER_LINE.match(line) and (index in (0, len(lines) - 1) or key in repeated_numbers):
+            continue
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(line)
+    return result
+
+
+def strip_boilerplate(page_texts: List[str]) -> List[List[str]]:
+    """Clean every page and drop lines repeated across many pages, keeping their first occurrence
+    Args:
+        page_texts: list - the text of each page, in order
+    Returns:
+        list: The remaining lines of each page
+    """
+    # Page-number-like lines found on more than one page are page numbers wherever they sit
+    number_pages = CountOf(
+        key for text in page_texts
+        for key in {line.lower() for line in _page_lines(text) if _PAGE_NUMBER_LINE.match(line)}
+    )
+    repeated_numbers = frozenset(key for key, count in number_pages.items() if count > 1)
+
+    pages = [clean_lines(text, repeated_numbers) for text in page_texts]
+    occurrences = CountOf(key for lines in pages for key in {_normalize_line(line) for line in lines})
+    threshold = max(BOILERPLATE_MIN_PAGES, BOILERPLATE_MIN_SHARE * len(pages))
+    boilerplate = {key for key, count in occurrences.items() if count >= threshold}
+
+    kept = set()
+    result = []
+    for lines in pages:
+        page_lines = []
+        for line in lines:
+            key = _normalize_line(line)
+            if key in boilerplate:
+                if key in kept:
+                    continue
+                kept.add(key)
+            page_lines.append(line)
+        result.append(page_lines)
+    return result
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, at a word boundary when there is one nearby"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max(max_chars - len(TRUNCATION_MARKER), 0)]
+    space = cut.rfind(" ")
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut + TRUNCATION_MARKER
+
+
+def _fair_share(sizes: List[int], budget: int) -> int:
+    """Largest per-section cap such that the capped sizes fit the budget (short sections are kept whole)"""
+    remaining = budget
+    ordered = sorted(sizes)
+    for index, size in enumerate(ordered):
+        share = remaining // (len(ordered) - index)
+        if size > share:
+            return share
+        remaining -= size
+    return max(ordered, default=0)
+
+
+def compact_deck_text(page_content: List[Dict[str, Any]], budget_tokens: int) -> Tuple[str, Dict[str, int]]:
+    """Whole-deck text for a prompt: boilerplate removed, one paragraph per page, within budget.
+
+    When the deck is still over budget, every page is cut to the same token allowance (pages
+    under the allowance are kept whole) so late slides are not dropped entirely.
+    Args:
+        page_content: list - pages as returned by extract_info_from_pdf
+        budget_tokens: int - maximum tokens of the returned text, 0 for no limit
+    Returns:
+        tuple: The compacted text and a report with original_tokens, compacted_tokens, saved_tokens
+        and truncated_pages
+    """
+    original_tokens = count_tokens("".join(page["text"] for page in page_content))
+    pages = strip_boilerplate([page["text"] for page in page_content])
+    sections = ["\n".join(lines) for lines in pages if lines]
+
+    truncated_pages = 0
+    separator_tokens = count_tokens("\n\n" * len(sections))
+    section_tokens = [count_tokens(section) for section in sections]
+    if budget_tokens > 0 and separator_tokens + sum(section_tokens) > budget_tokens:
+        cap = _fair_share(section_tokens, max(budget_tokens - separator_tokens, 0))
+        capped = []
+        for section in sections:
+            short = truncate_to_tokens(section, cap)
+            truncated_pages += int(short != section)
+            capped.append(short)
+        sections = capped
+
+    text = "\n\n".join(sections)
+    compacted_tokens = count_tokens(text)
+    return text, {
+        "original_tokens": original_tokens,
+        "compacted_tokens": compacted_tokens,
+        "saved_tokens": max(original_tokens - compacted_tokens, 0),
+        "truncated_pages": truncated_pages,
+    }
+
+
+def compact_text(text: str, budget_tokens: int) -> str:
+    """Whitespace collapsed and cut to the budget (0 for no limit), for free text reused across prompts"""
+    text = " ".join(text.split())
+    return truncate_to_tokens(text, budget_tokens) if budget_tokens > 0 else text
+
+
+def deck_context(general_context: str) -> str:
+    """The startup summary as the first block of a prompt, cut to PROMPT_BUDGET_CONTEXT_TOKENS since
+    it is re-sent to every specialist agent"""
+    return f"Context of the startup, from its pitch deck:\n{compact_text(general_context, PROMPT_BUDGET_CONTEXT_TOKENS)}"
+
+
+def compact_blocks(text_with_coordinates: List[Dict[str, Any]]) -> List[list]:
+    """Text blocks as [x0, y0, x1, y1, text] with whole-number coordinates, empty blocks dropped"""
+    blocks = []
+    for block in text_with_coordinates:
+        text = " ".join(block["text"].split())
+        if not text:
+            continue
+        coordinates = block["coordinates"]
+        blocks.append([round(coordinates["x0"]), round(coordinates["y0"]),
+                       round(coordinates["x1"]), round(coordinates["y1"]), text])
+    return blocks
+
+
+def fit_blocks(pages: List[Dict[str, Any]], budget_tokens: int) -> List[Dict[str, Any]]:
+    """Shorten the block texts of pages (dicts with a "blocks" list from compact_blocks) until their
+    compact JSON fits the budget. Coordinates are always kept, long blocks are cut first.
+    Args:
+        pages: list - dicts with a "blocks" key
+        budget_tokens: int - 0 for no limit
+    Returns:
+        list: The pages, with shortened copies of the blocks when needed
+    """
+    if budget_tokens <= 0 or count_tokens(compact_json(pages)) <= budget_tokens:
+        return pages
+    skeleton = [{**page, "blocks": [block[:4] + [""] for block in page["blocks"]]} for page in pages]
+    sizes = [count_tokens(block[4]) for page in pages for block in page["blocks"]]
+    cap = _fair_share(sizes, max(budget_tokens - count_tokens(compact_json(skeleton)), 0))
+    return [
+        {**page, "blocks": [block[:4] + [truncate_to_tokens(block[4], cap)] for block in page["blocks"]]}
+        for page in pages
+    ]
+
+
+class CompactionStats:
+    """Estimated input tokens before and after compaction, per agent"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def record(self, agent_name: str, original_tokens: int, compacted_tokens: int):
+        saved = max(original_tokens - compacted_tokens, 0)
+        with self._lock:
+            stats = self._agents.setdefault(agent_name, {"calls": 0, "original_tokens": 0, "compacted_tokens": 0})
+            stats["calls"] += 1
+            stats["original_tokens"] += original_tokens
+            stats["compacted_tokens"] += compacted_tokens
+        prompt_tokens_saved.inc(saved, agent=agent_name)
+        print(f"[Prompt compaction] {agent_name}: ~{original_tokens} -> ~{compacted_tokens} tokens ({saved} saved)")
+
+    def report(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            report = {agent: dict(stats) for agent, stats in self._agents.items()}
+        for stats in report.values():
+            stats["saved_tokens"] = max(stats["original_tokens"] - stats["compacted_tokens"], 0)
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._agents = {}
+
+
+compaction_stats = CompactionStats()
+
+
+if __name__ == "__main__":
+    import sys
+
+    try:
+        from utils.parse_pdf import extract_info_from_pdf
+    except ImportError:
+        from parse_pdf import extract_info_from_pdf
+
+    page_content, whole_text = extract_info_from_pdf(sys.argv[1] if len(sys.argv) > 1 else "test_pitch_solea.pdf")
+    for budget in [0, 2000, 500]:
+        text, report = compact_deck_text(page_content, budget)
+        print(f"budget {budget or 'none'}: {report}")
+    print(text)
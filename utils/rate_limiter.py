@@ -0,0 +1,326 @@
+import asyncio
+import contextvars
+import email.utils
+import heapq
+import itertools
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Optional
+
+try:
+    from utils.config import RATE_LIMIT_BASE_DELAY_SECONDS, RATE_LIMIT_MAX_DELAY_SECONDS, RATE_LIMIT_MAX_RETRIES
+    from utils.telemetry import provider_retries, provider_throttled, rate_limit_wait_seconds
+except ImportError:
+    from config import RATE_LIMIT_BASE_DELAY_SECONDS, RATE_LIMIT_MAX_DELAY_SECONDS, RATE_LIMIT_MAX_RETRIES
+    from telemetry import provider_retries, provider_throttled, rate_limit_wait_seconds
+
+# Priorities, lower goes first: a deck someone is waiting on beats a queued job
+INTERACTIVE = 0
+BATCH = 1
+
+# Status codes worth retrying: throttling, timeouts, overload and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLED_STATUS_CODES = {429, 529}
+
+# How often an async caller that is not at the head of the queue checks again
+ASYNC_POLL_SECONDS = 0.05
+
+_priority = contextvars.ContextVar("call_priority", default=INTERACTIVE)
+
+
+@contextmanager
+def call_priority(priority: int):
+    """Run every outbound call made inside the block (including from graph nodes) at this priority"""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> int:
+    return _priority.get()
+
+
+def status_code_of(exc: Exception) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_seconds(exc: Exception) -> Optional[float]:
+    """The delay asked for by the Retry-After (or retry-after-ms) header of a failed response"""
+    retry_after = getattr(exc, "retry_after_seconds", None)  # set by some SDK errors, e.g. Tavily's
+    if isinstance(retry_after, (int, float)):
+        return max(float(retry_after), 0.0)
+
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(float(retry_after), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(email.utils.parsedate_to_datetime(retry_after).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """Refills continuously at `per_minute` units a minute, holding at most `capacity`.
+    Not thread-safe on its own, ProviderLimiter guards it."""
+
+    def __init__(self, per_minute: float, capacity: float = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (requests bigger than the bucket only wait for a full one)"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Charge (positive) or refund (negative) the difference between an estimate and the real cost"""
+        self.level = min(self.capacity, self.level - amount)
+
+
+class ProviderLimiter:
+    """Outbound calls to one provider: token-bucket limits on requests and tokens per minute,
+    a priority queue in front of them, and retries with jittered exponential backoff.
+    Errors with a status code are retried by status, others when they are instances of `retry_on`
+    or `throttled_on` (the SDK's own "429" exception types).
+
+    Only the highest-priority waiter (FIFO within a priority) may take from the buckets, so a
+    burst of batch work cannot starve interactive calls. A throttled response pauses the whole
+    provider for the Retry-After it asked for, not just the caller that got it.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 retry_on: tuple = (), throttled_on: tuple = (), max_retries: int = RATE_LIMIT_MAX_RETRIES,
+                 base_delay: float = RATE_LIMIT_BASE_DELAY_SECONDS, max_delay: float = RATE_LIMIT_MAX_DELAY_SECONDS):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.retry_on = retry_on + throttled_on
+        self.throttled_on = throttled_on
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._cond = threading.Condition()
+        self._waiting = []  # heap of (priority, sequence) tickets
+        self._sequence = itertools.count()
+        self._paused_until = 0.0
+        self._stats = {"calls": 0, "retries": 0, "throttled": 0, "failures": 0, "wait_seconds": 0.0}
+
+    # Admission
+
+    def _delay(self, tokens: int, now: float) -> float:
+        delay = max(self._paused_until - now, 0.0)
+        if self.requests is not None:
+            delay = max(delay, self.requests.wait_time(1, now))
+        if self.tokens is not None and tokens:
+            delay = max(delay, self.tokens.wait_time(tokens, now))
+        return delay
+
+    def _try_take(self, ticket: tuple, tokens: int) -> Optional[float]:
+        """With the lock held: take from the buckets if this ticket may go now and return 0,
+        otherwise return how long to wait (None when another ticket is ahead)"""
+        if self._waiting[0] != ticket:
+            return None
+        delay = self._delay(tokens, time.monotonic())
+        if delay > 0:
+            return delay
+        if self.requests is not None:
+            self.requests.take(1)
+        if self.tokens is not None and tokens:
+            self.tokens.take(tokens)
+        return 0.0
+
+    def _enqueue(self, priority: Optional[int]) -> tuple:
+        ticket = (current_priority() if priority is None else priority, next(self._sequence))
+        heapq.heappush(self._waiting, ticket)
+        # A new head of the queue must be noticed by whoever was waiting as head before it
+        self._cond.notify_all()
+        return ticket
+
+    def _dequeue(self, ticket: tuple, started: float):
+        self._waiting.remove(ticket)
+        heapq.heapify(self._waiting)
+        waited = time.monotonic() - started
+        self._stats["wait_seconds"] += waited
+        rate_limit_wait_seconds.observe(waited, provider=self.name)
+        self._cond.notify_all()
+
+    def acquire(self, tokens: int = 0, priority: int = None):
+        """Block until a request of about `tokens` tokens may be sent"""
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+            try:
+                while True:
+                    delay = self._try_take(ticket, tokens)
+                    if delay == 0.0:
+                        return
+                    self._cond.wait(delay)
+            finally:
+                self._dequeue(ticket, started)
+
+    async def aacquire(self, tokens: int = 0, priority: int = None):
+        """Async acquire: waits with asyncio.sleep so the event loop keeps running"""
+        started = time.monotonic()
+        with self._cond:
+            ticket = self._enqueue(priority)
+        try:
+            while True:
+                with self._cond:
+                    delay = self._try_take(ticket, tokens)
+                if delay == 0.0:
+                    return
+                await asyncio.sleep(ASYNC_POLL_SECONDS if delay is None else min(delay, ASYNC_POLL_SECONDS * 10))
+        finally:
+            with self._cond:
+                self._dequeue(ticket, started)
+
+    def record_tokens(self, estimated: int, actual: int):
+        """Settle the token bucket once the real usage of a call is known"""
+        if self.tokens is None or actual == estimated:
+            return
+        with self._cond:
+            self.tokens.adjust(actual - estimated)
+            self._cond.notify_all()
+
+    # Retries
+
+    def is_retryable(self, exc: Exception) -> bool:
+        status = status_code_of(exc)
+        if status is not None:
+            return status in RETRYABLE_STATUS_CODES
+        return isinstance(exc, self.retry_on)
+
+    def _retry_delay(self, exc: Exception, attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying after `exc`, or None to give up and re-raise it"""
+        if not self.is_retryable(exc):
+            return None
+        status = status_code_of(exc)
+        with self._cond:
+            if attempt >= self.max_retries:
+                self._stats["failures"] += 1
+                return None
+            self._stats["retries"] += 1
+            provider_retries.inc(provider=self.name, error=type(exc).__name__)
+
+            # Full jitter, so callers throttled together do not all come back together
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+            retry_after = retry_after_seconds(exc)
+            if retry_after is not None:
+                delay = min(retry_after, self.max_delay) + random.uniform(0, self.base_delay)
+
+            if status in THROTTLED_STATUS_CODES or retry_after is not None or isinstance(exc, self.throttled_on):
+                self._stats["throttled"] += 1
+                provider_throttled.inc(provider=self.name)
+                self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                self._cond.notify_all()
+        print(f"{self.name}: {type(exc).__name__} (attempt {attempt + 1}/{self.max_retries + 1}), retrying in {delay:.1f}s")
+        return delay
+
+    def call(self, fn: Callable, tokens: int = 0, priority: int = None):
+        """Call `fn()` once the limits allow it, retrying retryable failures
+        Args:
+            fn: callable - takes no arguments (use functools.partial)
+            tokens: int - estimated tokens the call will use, 0 when the provider is not token-limited
+            priority: int - INTERACTIVE or BATCH, defaults to the call_priority of the caller
+        Returns:
+            The return value of fn
+        """
+        attempt = 0
+        while True:
+            self.acquire(tokens, priority)
+            with self._cond:
+                self._stats["calls"] += 1
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            time.sleep(delay)
+            attempt += 1
+
+    async def acall(self, fn: Callable[[], Awaitable], tokens: int = 0, priority: int = None):
+        """Async call: `fn()` must return an awaitable"""
+        attempt = 0
+        while True:
+            await self.aacquire(tokens, priority)
+            with self._cond:
+                self._stats["calls"] += 1
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._retry_delay(e, attempt)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def stats(self) -> dict:
+        with self._cond:
+            stats = dict(self._stats)
+            stats["wait_seconds"] = round(stats["wait_seconds"], 3)
+            stats["waiting"] = len(self._waiting)
+            stats["paused_for_seconds"] = round(max(self._paused_until - time.monotonic(), 0.0), 3)
+        return stats
+
+
+class RateLimitScheduler:
+    """Registry of the limiters of every outbound provider, for /health"""
+
+    def __init__(self):
+        self._limiters: Dict[str, ProviderLimiter] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, **kwargs) -> ProviderLimiter:
+        with self._lock:
+            if name not in self._limiters:
+                self._limiters[name] = ProviderLimiter(name, **kwargs)
+            return self._limiters[name]
+
+    def get(self, name: str) -> Optional[ProviderLimiter]:
+        with self._lock:
+            return self._limiters.get(name)
+
+    def stats(self) -> Dict[str, dict]:
+        with self._lock:
+            limiters = list(self._limiters.values())
+        return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+scheduler = RateLimitScheduler()
+
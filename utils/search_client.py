@@ -1,22 +1,118 @@
+import functools
+import threading
+from concurrent.futures import Future
+
+import requests
 from tavily import TavilyClient
+from tavily.errors import TimeoutError as TavilyTimeoutError, UsageLimitExceededError
 
 try:
-    from utils.config import TAVILY_API_KEY
+    from utils.cache import create_cache
+    from utils.config import (
+        CACHE_DB_PATH,
+        REDIS_URL,
+        SEARCH_CACHE_BACKEND,
+        SEARCH_CACHE_MAX_ENTRIES,
+        SEARCH_CACHE_TTL_SECONDS,
+        TAVILY_API_KEY,
+        TAVILY_REQUESTS_PER_MINUTE,
+    )
+    from utils.rate_limiter import scheduler
+    from utils.telemetry import cache_requests, span
 except ImportError:
-    from config import TAVILY_API_KEY
+    from cache import create_cache
+    from config import (
+        CACHE_DB_PATH,
+        REDIS_URL,
+        SEARCH_CACHE_BACKEND,
+        SEARCH_CACHE_MAX_ENTRIES,
+        SEARCH_CACHE_TTL_SECONDS,
+        TAVILY_API_KEY,
+        TAVILY_REQUESTS_PER_MINUTE,
+    )
+    from rate_limiter import scheduler
+    from telemetry import cache_requests, span
 
 
 tavily_client = TavilyClient(api_key=TAVILY_API_KEY)
+tavily_limiter = scheduler.register(
+    "tavily",
+    requests_per_minute=TAVILY_REQUESTS_PER_MINUTE,
+    retry_on=(TavilyTimeoutError, requests.ConnectionError),
+    throttled_on=(UsageLimitExceededError,),
+)
+
+# The same founders, competitors and markets come up across decks, so results are kept on disk
+search_cache = create_cache(
+    SEARCH_CACHE_BACKEND,
+    namespace="tavily_search",
+    max_entries=SEARCH_CACHE_MAX_ENTRIES,
+    ttl=SEARCH_CACHE_TTL_SECONDS,
+    path=CACHE_DB_PATH,
+    redis_url=REDIS_URL,
+)
+
+# Searches currently running upstream, so identical concurrent searches share one call
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_deduplicated = 0
+
+
+def normalize_query(query: str) -> str:
+    """Case and whitespace-insensitive form of a query, used as the cache key"""
+    return " ".join(query.lower().split())
+
 
 def search_tavily(query, max_results=2):
-    """Search using Tavily API
+    """Search using Tavily API, through the result cache
     Args:
         query: str - The search query
+        max_results: int
     Returns:
         dict - The search response from Tavily
     """
-    response = tavily_client.search(query, max_results=max_results)
-    return response
+    global _deduplicated
+    key = f"{max_results}:{normalize_query(query)}"
+
+    if search_cache is not None:
+        cached = search_cache.get(key)
+        cache_requests.inc(cache="search", result="miss" if cached is None else "hit")
+        if cached is not None:
+            return cached
+
+    with _in_flight_lock:
+        future = _in_flight.get(key)
+        is_owner = future is None
+        if is_owner:
+            future = Future()
+            _in_flight[key] = future
+        else:
+            _deduplicated += 1
+
+    if not is_owner:
+        # Another job is already running this exact search: wait for its result
+        return future.result()
+
+    try:
+        with span("search", "tavily", query=query):
+            response = tavily_limiter.call(functools.partial(tavily_client.search, query, max_results=max_results))
+        if search_cache is not None:
+            search_cache.set(key, response)
+        future.set_result(response)
+        return response
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _in_flight_lock:
+            _in_flight.pop(key, None)
+
+
+def search_stats() -> dict:
+    """Cache counters plus the number of searches merged into an identical in-flight search"""
+    stats = search_cache.stats() if search_cache is not None else {}
+    stats["deduplicated_in_flight"] = _deduplicated
+    return stats
 
 if __name__ == "__main__":
-    print(search_tavily("What is the capital of France?")) 
\ No newline at end of file
+    print(search_tavily("What is the capital of France?"))
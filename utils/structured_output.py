@@ -0,0 +1,257 @@
+import threading
+from typing import Callable, Dict, List, Literal, Optional, Type, TypeVar
+
+from anthropic.types import Message
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field, ValidationError
+
+try:
+    from utils.config import STRUCTURED_OUTPUT_REPAIR_ATTEMPTS
+    from utils.llm_gateway import CachedChatModel, create_message
+    from utils.telemetry import registry
+except ImportError:
+    from config import STRUCTURED_OUTPUT_REPAIR_ATTEMPTS
+    from llm_gateway import CachedChatModel, create_message
+    from telemetry import registry
+
+Schema = TypeVar("Schema", bound=BaseModel)
+
+structured_outputs = registry.counter(
+    "pitchdeck_structured_outputs_total",
+    "Structured LLM outputs by schema and result (valid, repaired or failed)",
+    ("agent", "schema", "result"),
+)
+
+
+# Schemas of the structured extractions. Every field the downstream code reads has a default or
+# is required, so a validated object always has the shape the agents expect.
+
+class Founder(BaseModel):
+    name: str = Field(description="Full name")
+    role: str = Field("", description="CEO/CTO/Founder/etc")
+    background: str = Field("", description="Previous companies and roles")
+    experience: str = Field("", description="Years of experience or key achievements")
+    education: str = Field("", description="University, degree, graduation year")
+    skills: str = Field("", description="Technical skills, programming languages, expertise areas")
+    interests: str = Field("", description="Relevant interests or specializations")
+
+
+class FoundersExtraction(BaseModel):
+    """Founders listed on a team slide, without duplicates (an empty list if there are none)"""
+    founders: List[Founder]
+
+
+class FounderVerification(BaseModel):
+    """Verification of a founder's claimed background against internet search results"""
+    credibility_score: int = Field(ge=0, le=100, description="0-100")
+    is_technical_founder: bool
+    background_verified: bool
+    linkedin_found: bool
+    startup_experience: bool
+    discrepancies: List[str] = Field(default_factory=list, description="Inconsistencies found")
+    technical_evidence: List[str] = Field(
+        default_factory=list, description="Programming languages, engineering roles, CS degree")
+    verified_facts: List[str] = Field(default_factory=list, description="Confirmed previous roles, education")
+    red_flags: List[str] = Field(default_factory=list, description="Concerning findings")
+    confidence_level: Literal["low", "medium", "high"]
+
+
+class CompetitorClaims(BaseModel):
+    competitor_name: str = Field(description="Exact company name mentioned")
+    factual_claims: List[str] = Field(
+        default_factory=list, description="Users, funding, founding year, countries of operation...")
+    feature_claims: List[str] = Field(
+        default_factory=list, description="Features or capabilities they have, lack or are limited to")
+    performance_claims: List[str] = Field(
+        default_factory=list, description="Speed, prices, customer satisfaction compared to the startup")
+    positioning_claims: List[str] = Field(
+        default_factory=list, description="\"We are better because...\", \"Unlike them, we...\", target markets")
+
+
+class CompetitorClaimsExtraction(BaseModel):
+    """Verifiable claims a slide makes about competitors and the market, in the slide's exact wording"""
+    competitor_claims: List[CompetitorClaims]
+    market_position_claims: List[str] = Field(
+        default_factory=list, description="\"We are the first to...\", \"No one else does...\", market sizes")
+
+
+class ClaimVerification(BaseModel):
+    claim: str = Field(description="Exact claim text")
+    verdict: Literal["accurate", "inaccurate", "partially_accurate", "insufficient_evidence"]
+    confidence: Literal["high", "medium", "low"]
+    supporting_evidence: str = Field("", description="Specific evidence, data or sources that support the claim")
+    contradicting_evidence: str = Field("", description="Contradicting evidence if any")
+    accuracy_score: int = Field(ge=0, le=100, description="0-100")
+    evidence_quality: Literal["strong", "moderate", "weak", "none"]
+
+
+class ClaimVerifications(BaseModel):
+    """Verification of every claim, in the order the claims were given"""
+    claim_verifications: List[ClaimVerification]
+
+
+class FeedbackCoordinates(BaseModel):
+    x0: float
+    y0: float
+    x1: float
+    y1: float
+
+
+class MatchedFeedbackItem(BaseModel):
+    feedback: str = Field(description="Specific feedback about this element")
+    coordinates: FeedbackCoordinates = Field(description="Box of the text block the feedback is about")
+    page_number: int = Field(description="Page number of the slide, as given with its blocks")
+    slide_type: Literal["team_slide", "market_size_slide", "competitors_slide"]
+    status: Literal["refuted", "unclear"] = Field(
+        description="refuted: clearly disproven or contradicted, unclear: cannot be verified or ambiguous")
+
+
+class MatchedFeedback(BaseModel):
+    """Negative feedback on the pitch deck, each item matched to the text block it is about"""
+    matched_feedback: List[MatchedFeedbackItem]
+
+
+def tool_definition(schema: Type[BaseModel]) -> dict:
+    """Anthropic tool whose input is the schema (nested models inlined, descriptions kept)"""
+    function = convert_to_openai_tool(schema)["function"]
+    return {"name": function["name"], "description": function["description"], "input_schema": function["parameters"]}
+
+
+def forced_tool(schema: Type[BaseModel]) -> dict:
+    """tools and tool_choice arguments making the model answer with exactly one call of the schema's tool"""
+    tool = tool_definition(schema)
+    return {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}}
+
+
+class StructuredOutputStats:
+    """Outcome of structured calls per agent: valid at once, valid after a repair, or failed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._agents = {}
+
+    def record(self, agent_name: str, schema_name: str, result: str):
+        with self._lock:
+            stats = self._agents.setdefault(agent_name, {"calls": 0, "valid": 0, "repaired": 0, "failed": 0})
+            stats["calls"] += 1
+            stats[result] += 1
+        structured_outputs.inc(agent=agent_name, schema=schema_name, result=result)
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            report = {agent: dict(stats) for agent, stats in self._agents.items()}
+        for stats in report.values():
+            stats["failure_rate"] = round(stats["failed"] / stats["calls"], 3) if stats["calls"] else 0.0
+        return report
+
+    def reset(self):
+        with self._lock:
+            self._agents = {}
+
+
+structured_output_stats = StructuredOutputStats()
+
+
+def _validate(schema: Type[Schema], tool_input: Optional[dict]) -> tuple[Optional[Schema], Optional[str]]:
+    if tool_input is None:
+        return None, f"No {schema.__name__} tool call in the response"
+    try:
+        return schema.model_validate(tool_input), None
+    except ValidationError as e:
+        return None, "\n".join(f"{'.'.join(map(str, error['loc']))}: {error['msg']}" for error in e.errors())
+
+
+def _call_with_repair(agent_name: str, schema: Type[Schema], send: Callable, tool_call: Callable,
+                      with_error: Callable) -> Optional[Schema]:
+    """Send a forced tool call and validate its input, re-asking with the errors up to
+    STRUCTURED_OUTPUT_REPAIR_ATTEMPTS times.
+    Args:
+        send: messages -> response (None for the original messages)
+        tool_call: response -> (tool_use_id, tool input), both None if the model did not call the tool
+        with_error: (messages, response, tool_use_id, error) -> messages asking for a corrected call
+    """
+    messages = None
+    response = send(messages)
+    for attempt in range(STRUCTURED_OUTPUT_REPAIR_ATTEMPTS + 1):
+        tool_use_id, tool_input = tool_call(response)
+        result, error = _validate(schema, tool_input)
+        if result is not None:
+            structured_output_stats.record(agent_name, schema.__name__, "repaired" if attempt else "valid")
+            return result
+        print(f"[Structured output] {agent_name}: invalid {schema.__name__} (attempt {attempt + 1}): {error[:300]}")
+        if attempt == STRUCTURED_OUTPUT_REPAIR_ATTEMPTS:
+            break
+        messages = with_error(messages, response, tool_use_id, error)
+        response = send(messages)
+
+    structured_output_stats.record(agent_name, schema.__name__, "failed")
+    return None
+
+
+def _repair_request(schema: Type[BaseModel], error: str) -> str:
+    return f"The {schema.__name__} input was invalid:\n{error}\nCall the tool again with corrected input."
+
+
+def invoke_structured(llm: CachedChatModel, messages: List[BaseMessage], schema: Type[Schema]) -> Optional[Schema]:
+    """Ask a chat model for an instance of schema through a forced tool call
+    Args:
+        llm: CachedChatModel - the agent's chat model (memoized and accounted as usual)
+        messages: list - the prompt
+        schema: pydantic model of the expected output
+    Returns:
+        The validated schema instance, or None if the output is still invalid after the repair attempts
+    """
+    tool_arguments = forced_tool(schema)
+    tool_name = tool_arguments["tool_choice"]["name"]
+
+    def send(repair_messages):
+        return llm.invoke(repair_messages or messages, **tool_arguments)
+
+    def tool_call(response: AIMessage):
+        call = next((call for call in response.tool_calls if call["name"] == tool_name), None)
+        return (call["id"], call["args"]) if call else (None, None)
+
+    def with_error(repair_messages, response, tool_use_id, error):
+        reply = (ToolMessage(content=_repair_request(schema, error), tool_call_id=tool_use_id, status="error")
+                 if tool_use_id else HumanMessage(content=_repair_request(schema, error)))
+        return [*(repair_messages or messages), response, reply]
+
+    return _call_with_repair(llm.agent_name, schema, send, tool_call, with_error)
+
+
+def create_structured_message(agent_name: str, schema: Type[Schema], **request) -> Optional[Schema]:
+    """create_message answering with an instance of schema through a forced tool call
+    Args:
+        agent_name: str - the agent the usage is recorded under
+        schema: pydantic model of the expected output
+        **request: the arguments for messages.create, without tools
+    Returns:
+        The validated schema instance, or None if the output is still invalid after the repair attempts
+    """
+    tool_arguments = forced_tool(schema)
+    tool_name = tool_arguments["tool_choice"]["name"]
+
+    def send(repair_messages):
+        return create_message(agent_name, **{**request, **tool_arguments,
+                                             "messages": repair_messages or request["messages"]})
+
+    def tool_call(response: Message):
+        block = next((block for block in response.content
+                      if block.type == "tool_use" and block.name == tool_name), None)
+        return (block.id, block.input) if block else (None, None)
+
+    def with_error(repair_messages, response, tool_use_id, error):
+        if tool_use_id:
+            reply = [{"type": "tool_result", "tool_use_id": tool_use_id, "is_error": True,
+                      "content": _repair_request(schema, error)}]
+        else:
+            reply = _repair_request(schema, error)
+        return [
+            *(repair_messages or request["messages"]),
+            {"role": "assistant", "content": [block.model_dump(mode="json", exclude_none=True)
+                                              for block in response.content]},
+            {"role": "user", "content": reply},
+        ]
+
+    return _call_with_repair(agent_name, schema, send, tool_call, with_error)
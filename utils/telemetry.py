@@ -0,0 +1,291 @@
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+try:
+    from utils.config import TRACING_EXPORTER, TRACING_SERVICE_NAME
+except ImportError:
+    from config import TRACING_EXPORTER, TRACING_SERVICE_NAME
+
+try:
+    from opentelemetry import trace
+except ImportError:
+    trace = None
+
+# Seconds, from a cached lookup to a whole deck
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    """Monotonic count per label set"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters only go up")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, dict(zip(self.label_names, key)), value) for key, value in items]
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        self._values: Dict[tuple, dict] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["buckets"][index] += 1
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def samples(self) -> list:
+        with self._lock:
+            items = sorted((key, {**entry, "buckets": list(entry["buckets"])}) for key, entry in self._values.items())
+        samples = []
+        for key, entry in items:
+            labels = dict(zip(self.label_names, key))
+            for bound, count in zip(self.buckets, entry["buckets"]):
+                samples.append((f"{self.name}_bucket", {**labels, "le": _format_value(bound)}, count))
+            samples.append((f"{self.name}_bucket", {**labels, "le": "+Inf"}, entry["count"]))
+            samples.append((f"{self.name}_sum", labels, entry["sum"]))
+            samples.append((f"{self.name}_count", labels, entry["count"]))
+        return samples
+
+
+class MetricsRegistry:
+    """Every metric of the process, rendered for a Prometheus scrape by /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+span_seconds = registry.histogram(
+    "pitchdeck_span_seconds", "Duration of graph nodes, LLM calls, searches and PDF steps", ("kind", "name"))
+span_errors = registry.counter(
+    "pitchdeck_span_errors_total", "Spans that ended with an exception", ("kind", "name", "error"))
+llm_tokens = registry.counter(
+    "pitchdeck_llm_tokens_total", "Tokens sent to and received from the LLM", ("agent", "direction"))
+llm_first_token_seconds = registry.histogram(
+    "pitchdeck_llm_first_token_seconds", "Time to the first token of streamed LLM calls", ("agent",))
+cache_requests = registry.counter(
+    "pitchdeck_cache_requests_total", "Cache lookups by cache and result (hit or miss)", ("cache", "result"))
+provider_retries = registry.counter(
+    "pitchdeck_provider_retries_total", "Retried outbound calls", ("provider", "error"))
+provider_throttled = registry.counter(
+    "pitchdeck_provider_throttled_total", "Retries that paused a provider (429, 529 or Retry-After)", ("provider",))
+rate_limit_wait_seconds = registry.histogram(
+    "pitchdeck_rate_limit_wait_seconds", "Time outbound calls waited for the rate limiter", ("provider",))
+bytes_sent = registry.counter(
+    "pitchdeck_bytes_sent_total", "Bytes sent, to the LLM (slide images) and to API clients", ("destination",))
+http_requests = registry.counter(
+    "pitchdeck_http_requests_total", "API requests by route and status", ("method", "route", "status"))
+http_request_seconds = registry.histogram(
+    "pitchdeck_http_request_seconds", "API request duration, until the last byte of the response", ("method", "route"))
+
+
+def _create_tracer():
+    """OpenTelemetry tracer, exporting spans when TRACING_EXPORTER is "otlp" or "console".
+
+    With only opentelemetry-api installed (or TRACING_EXPORTER=none) the tracer is a no-op,
+    unless the application configured its own tracer provider.
+    """
+    if trace is None:
+        if TRACING_EXPORTER != "none":
+            raise ImportError("TRACING_EXPORTER needs OpenTelemetry: pip install opentelemetry-sdk "
+                              "opentelemetry-exporter-otlp")
+        return None
+    if TRACING_EXPORTER == "none":
+        return trace.get_tracer("pitchdeck")
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        raise ImportError("TRACING_EXPORTER needs the OpenTelemetry SDK: pip install opentelemetry-sdk")
+
+    if TRACING_EXPORTER == "otlp":
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            raise ImportError("TRACING_EXPORTER=otlp needs pip install opentelemetry-exporter-otlp-proto-http")
+        exporter = OTLPSpanExporter()  # endpoint and headers from the standard OTEL_EXPORTER_OTLP_* variables
+    elif TRACING_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    else:
+        raise ValueError(f"Unknown tracing exporter: {TRACING_EXPORTER}")
+
+    provider = TracerProvider(resource=Resource.create({"service.name": TRACING_SERVICE_NAME}))
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    return trace.get_tracer("pitchdeck")
+
+
+tracer = _create_tracer()
+
+
+@contextmanager
+def span(kind: str, name: str, **attributes):
+    """Time a step of the pipeline into pitchdeck_span_seconds, and trace it when OpenTelemetry is set up
+    Args:
+        kind: str - "analysis", "node", "llm", "search", "pdf_extract" or "pdf_render"
+        name: str - the node, agent or step name
+        **attributes: extra span attributes (OpenTelemetry only, to keep metric labels bounded)
+    """
+    start = time.perf_counter()
+    otel_span = None
+    if tracer is not None:
+        otel_span = tracer.start_as_current_span(
+            f"{kind} {name}", attributes={"pitchdeck.kind": kind, "pitchdeck.name": name, **attributes}
+        )
+        otel_span.__enter__()
+    try:
+        yield
+    except BaseException as e:
+        span_errors.inc(kind=kind, name=name, error=type(e).__name__)
+        if otel_span is not None:
+            otel_span.__exit__(type(e), e, e.__traceback__)
+            otel_span = None
+        raise
+    finally:
+        span_seconds.observe(time.perf_counter() - start, kind=kind, name=name)
+        if otel_span is not None:
+            otel_span.__exit__(None, None, None)
+
+
+def traced(kind: str, name: str):
+    """Decorator form of span, used for graph nodes and whole analyses"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting requests, their duration and the response bytes actually sent.
+
+    Requests are labelled by route template (/jobs/{job_id}), not by path, so job ids do not
+    become labels. Streaming responses are timed until their last chunk.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = time.perf_counter()
+        status = {"code": 500}
+
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            elif message["type"] == "http.response.body":
+                bytes_sent.inc(len(message.get("body", b"")), destination="client")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, counting_send)
+        finally:
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests.inc(method=scope["method"], route=route, status=status["code"])
+            http_request_seconds.observe(time.perf_counter() - start, method=scope["method"], route=route)
+
+
+if __name__ == "__main__":
+    for index in range(3):
+        with span("node", "demo_node"):
+            time.sleep(0.01 * index)
+    try:
+        with span("llm", "demo_agent"):
+            raise TimeoutError("upstream timed out")
+    except TimeoutError:
+        pass
+    llm_tokens.inc(1200, agent="demo_agent", direction="input")
+    cache_requests.inc(cache="llm", result="hit")
+    print(registry.render())